@@ -29,51 +29,79 @@ Some are pedagogical in nature, others might actually be useful.
 
 Functions include:
 
+apply_peaks - Selects the peak channels of a signal, scaled by their rms
 atten - Attenuates input array by a dB value
+calibrate - Scales a signal so that its rms is a level in dB SPL
 compensate - Shapes the input array in the frequency domain
+compensator - Shapes a signal block by block, with a minimum-phase filter
 compress - Applies simple, single-channel compression to input signal signal
+compressor - Applies compression block by block, for real-time processing
+compression_apply - Applies a gain function generated by compress
+disk_cache - Caches processed stimuli on disk
+dynamic_itd - Applies an interaural time difference that can change over time
 envelope - Extracts the amplitude envelope from a signal
+envelope_follower - The attack/release peak detector used by compress, with state
 equate - Equates wavefiles in rms
 erbs2f - Converts erb numbers to frequency values
+expand_peaks - Repeats windowed peaks for each sample, over a range of samples
 f0 - Estimates the fundamental frequency of a signal
+f0_tracker - Estimates the fundamental frequency block by block
 f2erbs - Converts frequency values to erb numbers
 f2place - Converts a frequency (Hz) to a basilar membrane place (mm)
 f2oct - Calculates the distance in octaves between two frequencies
 fconv - Convolves two signals using FFT-based fast convolution
 filter_bank - Filters the input array with a bank of filters
 freq_compress - Performs frequency compression on a signal
+freq_compressor - Performs frequency compression block by block
 freqs_logspace - Computes a range of frequencies evenly spaced in log space
 gso - Varies the inter-aural correlation of a stereo signal
+gso_batch - Makes stereo signals with each of a number of inter-aural correlations
 hrtf_data - Helper class for handling hrtf data
 ild - Applies an interaural level difference to a signal
-interp - Interpolates a signal to a specified number of points
+interp - Resamples a signal to a specified number of points
 itd - Applies an interaural time difference to a signal
 lts - Computes a long-term spectrum of a signal
+lts_accumulator - Accumulates a long-term spectrum over many signals or blocks
+ltass - Computes the long-term average spectrum of a corpus of wav files
 magspec - Computes the magnitude spectrum of a signal
+memoize - Caches the return values of a deterministic signal function
 mix - Mixes [adds] signals, zero padding as needed and at specified offsets
+mix_snr - Mixes a target and masker at each of a number of snrs
 mls - Generates maximum-length sequences
 ms2samp - Converts milliseconds to samples
+multiband_compress - Applies multiband (hearing aid) compression to a signal
+multiband_compressor - Applies multiband compression block by block
 normalize - Normalizes wavefiles, so that the overall peak is 1
 oct2f - Calculates frequencies from octaves
+peak_picker - Finds rms peaks window by window, in a stream
 pick_peaks - Finds rms peaks in signals
 pink - Generates pink noise
 place2f - Converts a basilar membrane place (mm) to a frequency (Hz)
 pre_emphasis - Applies a pre-emphasis filter to a signal
 ramps - Applies ramps to the onsets and/or offsets of a signal
+resample - Resamples a signal by a rational factor, using polyphase filtering
+resampler - Resamples a signal block by block
 rir - Generates room impulse responses
 rms - Computes the root-mean-square of a signal
 samp2ms - Converts samples to milliseconds
 sliding_window - Apply a sliding window to a signal for vectorized processing
 smooth - Smooths a signal using windowing
+smoother - Smooths a signal block by block
 specgram - Plots a nice spectrogram
 specplot - Plots magnitude spectra
+spectrogram - A precomputed spectrogram, for fast plotting and browsing
 t60 - Estimates reverberation time
+t60_bands - Estimates octave-band reverberation times of many impulse responses
 tone - Generates pure tones
+tone_batch - Generates a batch of pure tones in one call
+tone_generator - Generates pure tones block by block, with continuous phase
 tcomplex - Generates tone complexes
 vocoder - Implements an envelope vocoder
 white - Generates white noise
 win_attack - Generates windows with control over attack times
+windower - Applies a sliding window to a signal that arrives in blocks
 zeropad - Zero pads the shorter of two or more arrays
+zeropad_batch - Zero pads a number of signals into a single array
 
 Dependencies:
 
@@ -85,30 +113,32 @@ from numpy.fft import fft, ifft
 from time import sleep
 from scipy.signal import filter_design as filters, lfilter, filtfilt
 from .atten import atten
-from .binaural import apply_itd, apply_ild, gso
-from .compensate import compensate
-from .compression import compress
+from .cache import memoize, disk_cache
+from .binaural import apply_itd, apply_ild, gso, gso_batch, dynamic_itd
+from .compensate import compensate, compensator
+from .compression import compress, compressor, compression_apply, envelope_follower, multiband_compress, multiband_compressor
 from .envelope import envelope, env_hilbert
-from .f0 import f0
+from .f0 import f0, f0_tracker
 from .filter import filter_bank, pre_emphasis
-from .freq_compression import freq_compress
+from .freq_compression import freq_compress, freq_compressor
 from .frequency import f2oct, oct2f, f2erb, erb2f, place2f, f2place, angle2f, f2angle, logspace
 from .spatial import win_cos, pan, convolve, hrtf_data
-#from .interp import interp
+from .interp import interp
 from .ir import ir
-from .level import spl2n0, spl2sp, spl2si, sp2spl, si2spl
-from .mix import mix
+from .level import spl2hl, hl2spl, spl2n0, spl2sp, spl2si, sp2spl, si2spl, calibrate
+from .mix import mix, mix_snr
 from .noise import pink, white, irn, mls
-from .peakpick import pick_peaks
+from .peakpick import pick_peaks, peak_picker, expand_peaks, apply_peaks
 from .ramps import ramps
+from .resample import resample, resampler
 from .rir import rir, fconv
 from .rms import rms
 from .samp import samp2ms, ms2samp
-from .smooth import smooth
+from .smooth import smooth, smoother
 from .soundfile import equate, normalize
-from .spec import lts, magspec, specgram, specplot
-from .tone import tone, tcomplex
-from .t60 import t60
+from .spec import lts, lts_accumulator, ltass, magspec, specgram, specplot, spectrogram
+from .tone import tone, tone_batch, tone_generator, tcomplex
+from .t60 import t60, t60_bands
 from .vocoder import vocoder, vocoder_vect, vocoder_overlap
-from .window import sliding_window, win_attack
-from .zeropad import zeropad
+from .window import sliding_window, win_attack, windower
+from .zeropad import zeropad, zeropad_batch
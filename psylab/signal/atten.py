@@ -25,7 +25,7 @@
 
 import numpy as np
 
-def atten(data, dB):
+def atten(data, dB, out=None):
     '''Attenuates input array by a dB value
     
         Positive dB values yield decreases in level, negative values 
@@ -35,13 +35,45 @@ def atten(data, dB):
         ----------
         data : ndarray
             Array containing numbers to attenuate. 
-        dB : int
-            The amount of attenuation, in dB. The default is to compute
-            the mean of the flattened array.
+        dB : scalar or array
+            The amount of attenuation, in dB. An array is broadcast against 
+            data, so that eg., a vector with one value per channel (dim 1) 
+            attenuates each channel by a different amount.
+        out : array
+            An optional array to write the output into, which can be data 
+            itself. If out is an integer array (eg., int16 PCM), the output 
+            is rounded and clipped to the range of its dtype.
         
         Returns
         -------
         data : array
-            The input array, attenuated.
+            The input array, attenuated. Floating point input keeps its 
+            dtype (eg., float32); other input gives float64.
     '''
-    return data * np.exp(np.float32(-dB)/8.6860)
+    return _apply_gain(data, np.exp(-np.asarray(dB, dtype=float)/8.6860), out)
+
+
+def _apply_gain(data, gain, out=None, chunksize=65536):
+    '''Multiplies data by gain, into out, keeping float dtypes and saturating ints
+    '''
+    dtype = np.result_type(data)
+    if out is None:
+        if np.issubdtype(dtype, np.floating):
+            gain = gain.astype(dtype)
+        return np.multiply(data, gain)
+    if not np.issubdtype(out.dtype, np.integer):
+        return np.multiply(data, gain.astype(out.dtype), out=out)
+    # Scale a chunk at a time, so that the float copy stays small
+    data = np.asarray(data)
+    info = np.iinfo(out.dtype)
+    by_sample = gain.ndim == data.ndim and gain.shape[0] > 1
+    for i in range(0, max(data.shape[0], 1) if data.ndim else 1, chunksize):
+        part = data[i:i+chunksize] if data.ndim else data
+        tmp = part * (gain[i:i+chunksize] if by_sample else gain)
+        np.rint(tmp, out=tmp)
+        np.clip(tmp, info.min, info.max, out=tmp)
+        if data.ndim:
+            out[i:i+chunksize] = tmp
+        else:
+            out[...] = tmp
+    return out
@@ -25,12 +25,17 @@
 #
 
 import numpy as np
+import scipy.fft
 
-def apply_itd( signal, fs, itd ):
+# Samples of zero padding after the delayed signals, for fft itds
+_FFT_PAD = 256
+
+def apply_itd( signal, fs, itd, method='round' ):
     '''Applies an interaural time difference to a signal
 
         Convenience function to apply an itd to a signal. Accepts both 1d and 
-        2d (shape[1] == 2) input arrays, although the output is always 2d.
+        2d (shape[1] == 2) input arrays, although the output is always 2d 
+        (or 3d, for more than one itd).
 
         Positive itd values will result in right-leading output signal (delay 
         to left channel) and negative itds will result in left-leading signals.
@@ -42,13 +47,20 @@ def apply_itd( signal, fs, itd ):
             stereo].
         fs : scalar
             The sampling frequency.
-        itd : scalar
-            The itd to apply, in µs.
+        itd : scalar or array
+            The itd to apply, in µs. If an array, the output has one row for 
+            each itd.
+        method : str
+            'round' [default] rounds the itd to a whole number of samples.
+            'fft' applies the exact (fractional) itd, as a phase shift in 
+            the frequency domain.
 
         Returns
         -------
-        out : 2d array
-            The input signal, with the specified itd applied.
+        out : array
+            The input signal, with the specified itd applied. The shape is 
+            (n + d, 2), or (itds, n + d, 2) if itd is an array, where d is 
+            the largest itd in samples (rounded up, for 'fft').
             
         Examples
         --------
@@ -68,31 +80,138 @@ def apply_itd( signal, fs, itd ):
                [ 1.,  1.],
                [ 1.,  1.],
                [ 0.,  1.]])
-        >>> 
+        >>> # An adaptive track's candidate itds, in 5-µs steps
+        >>> y = apply_itd(tone, 48000, np.arange(0, 101, 5), method='fft')
+        >>> y.shape
+        (21, 48005, 2)
     '''
-    # Compute delay in samples
-    itd_samp = np.int32(np.round((np.float32(np.abs(itd))/1000000.)*np.float32(fs)))
-    delay = np.zeros(itd_samp)
+    itds = np.atleast_1d(np.asarray(itd, dtype=float))
 
     # Ensure 2d
     if len(signal.shape) == 1:
         sig = np.vstack((signal, signal)).T
     else:
         sig = signal
+    n = sig.shape[0]
 
-    # Generate output array of correct shape
-    out = np.zeros((signal.shape[0]+itd_samp,2))
-    
-    # Apply itd
-    if itd > 0 :
-        out[:,0] = np.hstack((delay, sig[:,0]))
-        out[:,1] = np.hstack((sig[:,1], delay))
+    # The delay of each channel, in samples
+    delays = np.zeros((itds.size, 2))
+    if method == 'round':
+        itd_samp = np.int32(np.round((np.float32(np.abs(itds))/1000000.)*np.float32(fs)))
+        delays[itds > 0, 0] = itd_samp[itds > 0]
+        delays[itds <= 0, 1] = itd_samp[itds <= 0]
+        length = n + itd_samp.max()
+        out = np.zeros((itds.size, length, 2))
+        for o, d in zip(out, delays.astype(int)):
+            o[d[0]:d[0]+n, 0] = sig[:, 0]
+            o[d[1]:d[1]+n, 1] = sig[:, 1]
+    elif method == 'fft':
+        delays[:, 0] = np.maximum(itds, 0) * fs / 1000000.
+        delays[:, 1] = np.maximum(-itds, 0) * fs / 1000000.
+        length = n + int(np.ceil(delays.max()))
+        # Pad, so that the ringing of fractional delays doesn't wrap around
+        nfft = scipy.fft.next_fast_len(length + _FFT_PAD)
+        spec = scipy.fft.rfft(sig, nfft, axis=0)
+        k = np.arange(spec.shape[0])[:, np.newaxis]
+        shift = np.exp(-2j * np.pi * k * delays[:, np.newaxis, :] / nfft)
+        out = scipy.fft.irfft(spec * shift, nfft, axis=1)[:, :length]
     else:
-        out[:,0] = np.hstack((sig[:,0], delay))
-        out[:,1] = np.hstack((delay, sig[:,1]))
+        raise ValueError("method must be 'round' or 'fft'")
 
+    if np.ndim(itd) == 0:
+        return out[0]
     return out
-    
+
+
+class dynamic_itd(object):
+    '''Applies an interaural time difference that can change over time
+
+        The itd can change from one block to the next, or from one sample 
+        to the next. Fractional delays are applied with windowed sinc 
+        interpolation, and both channels are delayed by a further taps / 2 
+        samples (the latency).
+
+        Positive itd values will result in right-leading output signal (delay 
+        to left channel) and negative itds will result in left-leading signals.
+
+        Parameters
+        ----------
+        fs : scalar
+            The sampling frequency.
+        max_itd : scalar
+            The largest itd (magnitude) that will be used, in µs.
+        taps : int
+            The length of the interpolation filter. Must be even.
+
+        Example
+        -------
+        >>> d = dynamic_itd(48000)
+        >>> # An itd that moves from left to right leading, over 1 s
+        >>> y = d.process(noise, np.linspace(-500, 500, 48000))
+    '''
+    def __init__(self, fs, max_itd=1000, taps=32):
+        self.fs = fs
+        self.max_itd = max_itd
+        self.half = int(taps) // 2
+        self.max_delay = int(np.ceil(max_itd * fs / 1000000.))
+        self.reset()
+
+    def reset(self):
+        '''Clears the delay line
+        '''
+        self.x = np.zeros((2 * self.half + self.max_delay + 1, 2))
+        self.itd = 0.
+
+    def process(self, signal, itd):
+        '''Applies an itd to a block of samples
+
+            Parameters
+            ----------
+            signal : array
+                The next block. The shape can be (n,) or (n,2).
+            itd : scalar or array
+                The itd, in µs. Either a single value for the whole block, 
+                or an array with one value per sample.
+
+            Returns
+            -------
+            out : array
+                The output, of shape (n,2).
+        '''
+        if len(signal.shape) == 1:
+            signal = np.vstack((signal, signal)).T
+        n = signal.shape[0]
+        itd = np.broadcast_to(np.asarray(itd, dtype=float), (n,))
+        if np.any(np.abs(itd) > self.max_itd):
+            raise ValueError("itd cannot be larger than max_itd")
+        if n:
+            self.itd = itd[-1]
+        x = np.concatenate((self.x, signal))
+        hist = self.x.shape[0]
+
+        m = np.arange(-self.half + 1, self.half + 1)
+        out = np.empty((n, 2))
+        for ch, sign in enumerate([1, -1]):
+            delay = np.maximum(sign * itd, 0) * self.fs / 1000000.
+            # Read position of each output sample, in x
+            pos = hist + np.arange(n) - self.half - delay
+            i0 = np.floor(pos)
+            u = (pos - i0)[:, np.newaxis] - m
+            h = np.sinc(u) * (.5 + .5 * np.cos(np.pi * u / self.half))
+            out[:, ch] = np.einsum('nm,nm->n', h, x[i0.astype(int)[:, np.newaxis] + m, ch])
+        self.x = x[x.shape[0] - hist:]
+        return out
+
+    def flush(self):
+        '''Returns the rest of the output, using the last itd
+
+            Returns
+            -------
+            out : array
+                The last taps / 2 + max_itd samples of output.
+        '''
+        return self.process(np.zeros((self.half + self.max_delay, 2)), self.itd)
+
 
 def apply_ild( signal, ild, atten=1. ):
     '''Applies an interaural level difference to a signal
@@ -191,18 +310,99 @@ def gso(signal, rho):
 
     y = np.zeros_like(signal)
 
-    Lrms = np.sqrt(np.mean(xL**2.))
-    Rrms = np.sqrt(np.mean(xR**2.))
-    num = np.mean(xL*xR)
-    dem = Lrms * Rrms
-    rhoLR = num / dem
-    factor1 = Lrms/(Rrms*np.sqrt(1.-rhoLR**2.))
-    factor2 = rhoLR/np.sqrt(1.-rhoLR**2.)
-    xRstar = factor1*xR-factor2*xL
+    xRstar = _orthogonalize(xL, xR)
     
     alpha = np.sqrt(1-rho**2.)
     y[:,0] = xL;
     y[:,1] = rho * xL + alpha * xRstar
 
     return y
+
+
+def gso_batch(signals, rho, seed=None, workers=None):
+    """Makes stereo signals with each of a number of inter-aural correlations
+
+        As gso, for a stack of signals (eg., noise pairs) and a vector of 
+        target correlations. Each pair is orthogonalized once, and the 
+        outputs for all values of rho are made from it.
+
+        Parameters
+        ----------
+        signals : array or tuple
+            The input signals, of shape (pairs, n, 2) or (n, 2). Or a tuple 
+            (pairs, n), to draw that many pairs of n samples of Gaussian 
+            noise.
+        rho : scalar or array
+            The target cross-correlations. Should be 0 <= 1.
+        seed : int
+            The seed for the noise. Each pair is drawn from its own stream, 
+            so the noise is the same for any number of workers.
+        workers : int
+            The number of threads over which to divide drawing the noise. 
+            Default = None (1)
+
+        Returns
+        -------
+        y : array
+            The correlated signals, of shape (pairs, rhos, n, 2). The pairs 
+            axis is dropped for 2-d input, and the rhos axis for a scalar 
+            rho.
+
+        Example
+        -------
+        >>> # 20 fresh noise pairs, at each of 5 correlations
+        >>> y = gso_batch((20, 44100), [1., .99, .98, .95, .9], seed=1)
+        >>> y.shape
+        (20, 5, 44100, 2)
+    """
+    if isinstance(signals, tuple):
+        x = _noise_pairs(signals[0], signals[1], seed, workers)
+    else:
+        x = np.asarray(signals)
+    x3 = x if x.ndim == 3 else x[np.newaxis]
+    rhos = np.atleast_1d(np.asarray(rho, dtype=float))[:, np.newaxis]
+
+    xL = x3[:, np.newaxis, :, 0]
+    xRstar = _orthogonalize(x3[:, :, 0], x3[:, :, 1])[:, np.newaxis]
+    y = np.empty((x3.shape[0], rhos.shape[0], x3.shape[1], 2), dtype=np.result_type(x3.dtype, float))
+    y[..., 0] = xL
+    y[..., 1] = rhos * xL + np.sqrt(1 - rhos**2.) * xRstar
+
+    if x.ndim == 2:
+        y = y[0]
+    if np.ndim(rho) == 0:
+        y = y[..., 0, :, :]
+    return y
+
+
+def _orthogonalize(xL, xR):
+    """Returns xR, made orthogonal to xL and scaled to its rms, along axis -1
+    """
+    Lrms = np.sqrt(np.mean(xL**2., axis=-1, keepdims=True))
+    Rrms = np.sqrt(np.mean(xR**2., axis=-1, keepdims=True))
+    num = np.mean(xL*xR, axis=-1, keepdims=True)
+    dem = Lrms * Rrms
+    rhoLR = num / dem
+    factor1 = Lrms/(Rrms*np.sqrt(1.-rhoLR**2.))
+    factor2 = rhoLR/np.sqrt(1.-rhoLR**2.)
+    return factor1*xR-factor2*xL
+
+
+def _noise_pairs(pairs, n, seed=None, workers=None):
+    """Draws pairs of Gaussian noise, of shape (pairs, n, 2)
+    """
+    out = np.empty((pairs, n, 2))
+    streams = np.random.SeedSequence(seed).spawn(pairs)
+    def fill(idx):
+        for i in idx:
+            np.random.default_rng(streams[i]).standard_normal((n, 2), out=out[i])
+    groups = np.array_split(np.arange(pairs), min(workers or 1, max(pairs, 1)))
+    if len(groups) > 1:
+        # numpy's generators release the GIL while filling arrays
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(len(groups)) as pool:
+            list(pool.map(fill, groups))
+    else:
+        fill(groups[0])
+    return out
     
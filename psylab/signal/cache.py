@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of Psylab.
+#
+# Psylab is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Psylab is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Psylab.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Bug reports, bug fixes, suggestions, enhancements, or other
+# contributions are welcome. Go to https://github.com/cbrown1/psylab/
+# for more information and to contribute. Or send an e-mail to:
+# cbrown1@pitt.edu.
+#
+
+
+import os
+import sys
+import time
+import types
+import pickle
+import hashlib
+import tempfile
+import threading
+import functools
+from collections import OrderedDict
+import numpy as np
+
+# Seconds after which an unrenamed temporary file is taken to be abandoned
+_TMP_AGE = 3600
+
+
+def memoize(func=None, maxbytes=256*2**20):
+    '''Caches the return values of a deterministic signal function
+
+        Wraps func so that calls with the same arguments return a cached 
+        result rather than recomputing it. Array arguments are hashed by 
+        content, so two equal arrays hit the same cache entry. The least 
+        recently used entries are evicted when the cached arrays exceed 
+        maxbytes. Can be used as a decorator, with or without arguments.
+
+        Parameters
+        ----------
+        func : function
+            The function to wrap.
+        maxbytes : int
+            The maximum total size, in bytes, of the cached return values. 
+            [default = 256 MB]
+
+        Returns
+        -------
+        f : memoized
+            A callable with the same signature as func. Call f.cache_info() 
+            for hit, miss and eviction counts, and f.cache_clear() to empty 
+            the cache.
+
+        Notes
+        -----
+        Returned arrays are marked read-only, because the same array is 
+        handed to every caller. Use .copy() if you need to modify one.
+
+        An out= keyword argument (as taken by mix and tone_batch) is not 
+        part of the key. On a hit, the cached result is copied into out, 
+        and on a miss, func fills it; either way out is returned, and is 
+        left writeable.
+
+        Only use this with functions whose output depends on their arguments 
+        alone. Wrapping a noise generator, for example, will return the same 
+        (frozen) noise on every call.
+
+        Example
+        -------
+        >>> tone = memoize(psylab.signal.tone, maxbytes=64*2**20)
+        >>> a = tone(1000, 44100, 500) # Computed
+        >>> b = tone(1000, 44100, 500) # Retrieved from cache
+        >>> tone.cache_info()
+        {'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1, 'nbytes': 176400, 'maxbytes': 67108864}
+
+        >>> @memoize(maxbytes=2**30)
+        ... def masker(fs, dur):
+        ...     ...
+    '''
+    if func is None:
+        return lambda f: memoized(f, maxbytes)
+    return memoized(func, maxbytes)
+
+
+class memoized:
+    """A byte-bounded LRU cache around a function. See memoize.
+    """
+    def __init__(self, func, maxbytes=256*2**20):
+        self.func = func
+        self.maxbytes = maxbytes
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_clear()
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        out = kwargs.pop('out', None)
+        key = make_key(self.func, args, kwargs)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                value = self._cache.pop(key)
+                self._cache[key] = value # Most recently used goes last
+                return _fill(out, value)
+            self.misses += 1
+
+        if out is None:
+            result = self.func(*args, **kwargs)
+        else:
+            result = self.func(*args, out=out, **kwargs)
+        value = _freeze(result, args + tuple(kwargs.values()) + (out,))
+        size = _nbytes(value)
+        if size <= self.maxbytes:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = value
+                    self.nbytes += size
+                while self.nbytes > self.maxbytes:
+                    k, v = self._cache.popitem(last=False)
+                    self.nbytes -= _nbytes(v)
+                    self.evictions += 1
+        return value if out is None else result
+
+    def cache_info(self):
+        """Returns a dict of cache statistics
+        """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._cache),
+                    'nbytes': self.nbytes,
+                    'maxbytes': self.maxbytes,
+                   }
+
+    def cache_clear(self):
+        """Empties the cache and resets the statistics
+        """
+        with self._lock:
+            self._cache.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+def make_key(func, args, kwargs):
+    """Returns a hashable key for a function call
+
+        Arrays are reduced to their dtype, shape and a hash of their 
+        contents, and lists, tuples and dicts are converted recursively.
+    """
+    name = getattr(func, '__module__', '') + '.' + getattr(func, '__qualname__', getattr(func, '__name__', ''))
+    return (name, _key(args), _key(sorted(kwargs.items())))
+
+
+def _key(obj):
+    if isinstance(obj, np.ndarray):
+        h = hashlib.sha1(np.ascontiguousarray(obj).view(np.uint8)).hexdigest()
+        return ('ndarray', obj.dtype.str, obj.shape, h)
+    elif isinstance(obj, np.generic):
+        return (obj.dtype.str, obj.item())
+    elif isinstance(obj, (list, tuple)):
+        return (type(obj).__name__,) + tuple(_key(o) for o in obj)
+    elif isinstance(obj, dict):
+        return ('dict',) + tuple((k, _key(v)) for k, v in sorted(obj.items()))
+    elif isinstance(obj, type):
+        return (obj.__module__, obj.__name__)
+    elif callable(obj) and hasattr(obj, '__name__'):
+        # eg., a window function passed as an argument; avoid the default 
+        # repr, which contains a memory address
+        return ('callable', getattr(obj, '__module__', ''), obj.__name__)
+    try:
+        hash(obj)
+        return obj
+    except TypeError:
+        return repr(obj)
+
+
+def _freeze(value, args=()):
+    """Returns a read-only version of value, without changing value itself
+
+        Arrays that may belong to the caller (views, or one of args) are 
+        copied, so that later changes to them do not reach the cache.
+    """
+    if isinstance(value, np.ndarray):
+        if value.base is not None or any(value is a for a in args):
+            value = value.copy()
+        else:
+            value = value.view()
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        value = tuple(_freeze(v, args) for v in value)
+    return value
+
+
+def _fill(out, value):
+    """Copies a cached value into out, if given, and returns out (or value)
+    """
+    if out is None:
+        return value
+    if isinstance(out, tuple):
+        for o, v in zip(out, value):
+            np.copyto(o, v)
+    else:
+        np.copyto(out, value)
+    return out
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class disk_cache:
+    """A content-addressed on-disk cache for processed stimuli
+
+        Stores the results of expensive signal processing (vocoding, 
+        convolution with room impulse responses, frequency compression, etc.) 
+        as .npy files, so they are computed once and then loaded, memory-mapped, 
+        on every subsequent run. 
+
+        Each result is keyed on a hash of the function (its name, bytecode, 
+        constants, defaults and closure, and the source file of its module), 
+        of the cache version, and of all arguments. Array arguments are 
+        hashed by content. String arguments that name an existing file are 
+        keyed on the file's path, modification time and size instead, so a 
+        changed file on disk is picked up without having to hash its contents.
+
+        Parameters
+        ----------
+        path : string
+            The folder in which to store cached results. It will be created 
+            if necessary.
+        maxbytes : int
+            The maximum total size of the cache folder, in bytes. When it is 
+            exceeded, the least recently used results are deleted. None for 
+            no limit. [default = None]
+        version : any
+            Included in every key. Change it to invalidate the cache when 
+            something the key cannot see changes, such as a helper in 
+            another module that the cached function calls. [default = None]
+
+        Notes
+        -----
+        Results must be arrays, or tuples of arrays. They are returned as 
+        read-only memory-mapped arrays; use .copy() to modify one. An out= 
+        keyword argument is not part of the key; it is filled (from the 
+        cache on a hit) and returned instead.
+
+        Arguments other than arrays, numbers and strings are keyed on their 
+        repr, or if that contains a memory address, on their pickle. A 
+        TypeError is raised for arguments that have neither.
+
+        Results are written to a temporary file and then renamed into place, 
+        so several processes (eg., parallel session scripts) can safely share 
+        one cache folder. Two processes computing the same result at the same 
+        time will both compute it, but readers will only ever see complete 
+        files.
+
+        Example
+        -------
+        >>> cache = disk_cache('/path/to/cache', maxbytes=20*2**30)
+        >>> # Call a function through the cache
+        >>> voc = cache(psylab.signal.vocoder, sig, fs, 8, 150, 8000)
+        >>> # Or wrap it once and use the wrapped version in its place
+        >>> vocoder = cache.wrap(psylab.signal.vocoder)
+        >>> voc = vocoder(sig, fs, 8, 150, 8000)
+        >>> cache.hits, cache.misses
+        (1, 1)
+    """
+    def __init__(self, path, maxbytes=None, version=None):
+        self.path = path
+        self.maxbytes = maxbytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def __call__(self, func, *args, **kwargs):
+        out = kwargs.pop('out', None)
+        name = self.get_key(func, args, kwargs)
+        value = self._load(name)
+        if value is not None:
+            self.hits += 1
+            return _fill(out, value)
+
+        self.misses += 1
+        if out is None:
+            value = func(*args, **kwargs)
+        else:
+            value = func(*args, out=out, **kwargs)
+        if isinstance(value, tuple):
+            for i, v in enumerate(value):
+                self._save(np.asarray(v), "{}-{}.npy".format(name, i))
+            # The index file is written last, so a tuple is only visible
+            # once all of its elements are in place
+            self._save(np.array(len(value)), "{}.tuple.npy".format(name))
+        else:
+            self._save(np.asarray(value), "{}.npy".format(name))
+        if self.maxbytes is not None:
+            self.evict()
+        if out is not None:
+            return value
+        loaded = self._load(name)
+        if loaded is None: # Larger than maxbytes, so already evicted
+            return _freeze(value, args + tuple(kwargs.values()))
+        return loaded
+
+    def wrap(self, func):
+        """Returns a version of func whose calls go through the cache
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self(func, *args, **kwargs)
+        return wrapper
+
+    def get_key(self, func, args, kwargs):
+        """Returns the hash that identifies a function call in the cache
+        """
+        key = make_key(func, _files(args), _files(kwargs)) + (_func_key(func), self.version)
+        return hashlib.sha1(repr(_stable(key)).encode('utf-8')).hexdigest()
+
+    def get_size(self):
+        """Returns the total size of the cached results, in bytes
+        """
+        return sum(size for f, mtime, size in self._entries())
+
+    def evict(self, maxbytes=None):
+        """Deletes the least recently used results until the cache is no 
+            larger than maxbytes [default = self.maxbytes]
+        """
+        if maxbytes is None:
+            maxbytes = self.maxbytes
+        self._remove_stale()
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(e[2] for e in entries)
+        for f, mtime, size in entries:
+            if total <= maxbytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, f))
+            except OSError:
+                pass # Already removed by another process
+            total -= size
+
+    def clear(self):
+        """Deletes all cached results
+        """
+        self.evict(0)
+
+    def _remove_stale(self):
+        # Temporary files left by writers that crashed before renaming them
+        now = time.time()
+        for f in os.listdir(self.path):
+            if f.endswith('.tmp'):
+                fn = os.path.join(self.path, f)
+                try:
+                    if now - os.stat(fn).st_mtime > _TMP_AGE:
+                        os.remove(fn)
+                except OSError:
+                    pass
+
+    def _entries(self):
+        for f in os.listdir(self.path):
+            if f.endswith('.npy'):
+                try:
+                    st = os.stat(os.path.join(self.path, f))
+                except OSError:
+                    continue
+                yield f, st.st_mtime, st.st_size
+
+    def _load(self, name):
+        try:
+            fn = os.path.join(self.path, "{}.npy".format(name))
+            if os.path.exists(fn):
+                return self._open(fn)
+            fn = os.path.join(self.path, "{}.tuple.npy".format(name))
+            if os.path.exists(fn):
+                n = int(np.load(fn))
+                os.utime(fn, None)
+                return tuple(self._open(os.path.join(self.path, "{}-{}.npy".format(name, i)))
+                             for i in range(n))
+        except (OSError, IOError, ValueError):
+            pass # Evicted while reading; recompute
+        return None
+
+    def _open(self, fn):
+        os.utime(fn, None) # Mark as recently used
+        value = np.load(fn, mmap_mode='r')
+        if value.ndim == 0:
+            value = value[()]
+        return value
+
+    def _save(self, value, fname):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, value)
+            os.replace(tmp, os.path.join(self.path, fname))
+        except Exception:
+            os.remove(tmp)
+            raise
+
+
+def _func_key(func):
+    """Returns what identifies the code of func, for disk_cache keys
+    """
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return None
+    closure = [c.cell_contents for c in (func.__closure__ or ())]
+    return (_code_key(code),
+            _key(func.__defaults__),
+            _key(sorted((func.__kwdefaults__ or {}).items())),
+            _key(closure),
+            _source_key(getattr(func, '__module__', None)))
+
+
+def _code_key(code):
+    consts = []
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            consts.append(_code_key(c)) # eg., a nested function
+        elif isinstance(c, frozenset):
+            consts.append(sorted(repr(v) for v in c))
+        else:
+            consts.append(repr(c))
+    return (hashlib.sha1(code.co_code).hexdigest(), tuple(consts), code.co_names)
+
+
+def _source_key(module):
+    """Returns a hash of the source file of a module, or None
+    """
+    fn = getattr(sys.modules.get(module), '__file__', None)
+    if fn is None or not os.path.isfile(fn):
+        return None
+    st = os.stat(fn)
+    return _source_hash(fn, st.st_mtime, st.st_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _source_hash(fn, mtime, size):
+    with open(fn, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _stable(obj):
+    """Converts a key so that its repr is the same in every process
+    """
+    if isinstance(obj, tuple):
+        return tuple(_stable(o) for o in obj)
+    elif obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        return obj
+    r = repr(obj)
+    if not ' at 0x' in r:
+        return r
+    try:
+        return ('pickle', hashlib.sha1(pickle.dumps(obj)).hexdigest())
+    except Exception:
+        raise TypeError("Can't make a disk_cache key from {}".format(r))
+
+
+def _files(obj):
+    """Replaces paths to existing files with (path, mtime, size)
+    """
+    if isinstance(obj, str) and os.path.isfile(obj):
+        st = os.stat(obj)
+        return ('file', os.path.abspath(obj), st.st_mtime, st.st_size)
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(_files(o) for o in obj)
+    elif isinstance(obj, dict):
+        return dict((k, _files(v)) for k, v in obj.items())
+    return obj
@@ -24,8 +24,11 @@
 #
 
 import numpy as np
+import scipy.fft
+from scipy.signal import lfilter
+from .cache import memoize
 
-def compensate(y, fs, compensation):
+def compensate(y, fs, compensation, axis=0):
     '''Shapes the input array in the frequency domain
 
         The input array y will be compensated in the frequency domain
@@ -41,10 +44,12 @@ def compensate(y, fs, compensation):
             Array containing waveform(s) to shape. 
         fs : scalar
             The sampling frequency.
-        dB : array
+        compensation : array
             A 2d array, containing pairs of values. Each pair should consist
             of a frequency value in Hz, and an attenuation value, in dB 
             (negative values mean more attenuation).
+        axis : int
+            The axis along which to compensate. Default = 0
             
         Returns
         -------
@@ -72,44 +77,104 @@ def compensate(y, fs, compensation):
 
         Then, you just call compensate:
         >>>shapedsignal = compensate(signal, fs, compdata)
+
+        The gain for each combination of signal length, fs, and 
+        compensation is computed once and cached. To compensate a signal 
+        block by block, use compensator.
     '''
 
-    nsamples = y.shape[0]
-    ExtendedCMdB = np.zeros(nsamples)
+    y = np.asarray(y)
+    nsamples = y.shape[axis]
+    shape = [1] * y.ndim
+    shape[axis] = -1
+    gain = _gain(nsamples, fs, np.asarray(compensation, dtype=float)).reshape(shape)
+    return scipy.fft.irfft(scipy.fft.rfft(y, axis=axis) * gain, nsamples, axis=axis)
+
+
+class compensator:
+    '''Shapes a signal block by block, using a minimum-phase FIR filter
 
-    CMn = np.round(compensation[:, 0] * nsamples / fs);    # Hz --> Sample position
-    CMdB = compensation[:, 1];
+        The filter approximates the magnitude response of compensate, 
+        with the delay of a minimum-phase filter rather than that of a 
+        linear-phase one. The filter state is carried from one block to 
+        the next, for use in real-time (eg., headphone or loudspeaker 
+        compensation) pipelines.
+
+        Parameters
+        ----------
+        fs : scalar
+            The sampling frequency.
+        compensation : array
+            A 2d array of frequency (Hz), attenuation (dB) pairs, as for 
+            compensate.
+        numtaps : int
+            The length of the filter. Default = 512
+
+        Example
+        -------
+        >>> c = psylab.signal.compensator(fs, compdata)
+        >>> for block in blocks:
+        ...     out = c.process(block)
+    '''
+    def __init__(self, fs, compensation, numtaps=512):
+        self.fs = fs
+        self.numtaps = int(numtaps)
+        nfft = 2**int(np.ceil(np.log2(16 * self.numtaps)))
+        gain = _gain(nfft, fs, np.asarray(compensation, dtype=float))
+        # Homomorphic minimum-phase conversion, by folding the real cepstrum
+        c = scipy.fft.irfft(np.log(gain), nfft)
+        c[1:nfft//2] *= 2
+        c[nfft//2+1:] = 0
+        self.b = scipy.fft.irfft(np.exp(scipy.fft.rfft(c)), nfft)[:self.numtaps]
+        self.reset()
+
+    def reset(self):
+        '''Clears the filter state
+        '''
+        self.zi = None
+
+    def process(self, sig):
+        '''Filters the next block of the signal
+
+            Parameters
+            ----------
+            sig : array
+                The next block. Samples are along axis 0, and channels 
+                along axis 1.
+
+            Returns
+            -------
+            y : array
+                The filtered block.
+        '''
+        sig = np.asarray(sig)
+        if self.zi is None:
+            self.zi = np.zeros((self.numtaps - 1,) + sig.shape[1:])
+        out, self.zi = lfilter(self.b, 1., sig, axis=0, zi=self.zi)
+        return out
+
+
+@memoize
+def _gain(nsamples, fs, compensation):
+    '''Returns the linear gain at each of the nsamples//2+1 rfft bins
+
+        The dB values are interpolated linearly between the compensation 
+        points, which are anchored at 0 dB at bin 2 and at fs/2. Bins 
+        outside of that range are not changed.
+    '''
+    CMn = np.round(compensation[:, 0] * nsamples / fs)    # Hz --> Sample position
+    CMdB = compensation[:, 1]
     if CMn[0] > 2:
         CMn = np.hstack((2, CMn))
         CMdB = np.hstack((0, CMdB))
     else:
-        CMn[0] = 2;
+        CMn[0] = 2
 
     if CMn.max() < nsamples/2.:
         CMn = np.hstack((CMn, nsamples/2.))
         CMdB = np.hstack((CMdB, 0))
 
-    for i in range(len(CMn)-1):
-        b = (CMdB[i+1]*CMn[i]-CMdB[i]*CMn[i+1])/(CMn[i]-CMn[i+1]);
-        k = (CMdB[i]-CMdB[i+1])/(CMn[i]-CMn[i+1]);
-        for j in range(int(CMn[i]),int(CMn[i+1])):
-            ExtendedCMdB[j] =  k * j + b;
-            ExtendedCMdB[nsamples - j + 1] =  k * j + b;
-
-    if y.ndim > 1:
-        passes = y.shape[1]
-        out = np.zeros((nsamples, passes))
-        for i in range(passes):
-            fftout = np.fft.fft(y);
-            Amp = np.abs(fftout);
-            Phs = np.angle(fftout);
-            AdjustedAmp = Amp * 10 ** (ExtendedCMdB/20.);
-            out[:, i] = np.real(np.fft.ifft(AdjustedAmp * np.exp(1j*Phs)))  # compose time-domain signal
-    else:
-        fftout = np.fft.fft(y);
-        Amp = np.abs(fftout);
-        Phs = np.angle(fftout);
-        AdjustedAmp = Amp * 10 ** (ExtendedCMdB/20.);
-        out = np.real(np.fft.ifft(AdjustedAmp * np.exp(1j*Phs)))  # compose time-domain signal
-
-    return out
+    j = np.arange(nsamples//2+1)
+    dB = np.interp(j, CMn, CMdB)
+    dB[(j < CMn[0]) | (j >= CMn[-1])] = 0
+    return 10 ** (dB/20.)
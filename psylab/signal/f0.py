@@ -24,9 +24,11 @@
 #
 
 import numpy as np
+import scipy.signal
 from scipy.signal import filter_design as filters, lfilter, filtfilt
+from .envelope import envelope
 
-def f0(sig,fs,noisegate=15):
+def f0(sig,fs,noisegate=15,frame_rate=None):
     '''Estimates the fundamental frequency of a signal
         
         Returns an array of estimated instantaneous fundamental frequency 
@@ -35,65 +37,230 @@ def f0(sig,fs,noisegate=15):
         Parameters
         ----------
         sig : array
-            The input signal.
+            The input signal. If 2-d, the pitch track of each column (eg., 
+            each token of a batch) is estimated.
         fs : array
             The sampling frequency.
+        noisegate : scalar
+            Samples (or frames) with envelopes more than noisegate dB 
+            below the peak are treated as unvoiced [default = 15]
+        frame_rate : scalar
+            If specified, the pitch track is returned at this rate (in 
+            frames per second; eg., 100), as the mean of each frame, and 
+            the smoothing and voicing are computed at that rate. Must be 
+            greater than 32. Default = None (the pitch track is at fs).
         
         Returns
         -------
         y : array
             The pitch track.
     '''
+    sig = np.asarray(sig)
+    x = sig.reshape((sig.shape[0], -1))
     
     # Low-pass at 270 Hz (above most F0's)
     b,a = filters.butter(4,270./(fs/2.))
-    fsig = filtfilt(b,a,sig)
+    fsig = filtfilt(b,a,x,axis=0)
     b,a = filters.butter(4,60./(fs/2.),btype='high')
-    fsig = filtfilt(b,a,fsig)
-    # Get zero crossings
-    zc = np.array(np.where(np.sign(fsig[1:]) != np.sign(fsig[:-1]))).transpose()[:,0]
-    # Compute period at each crossing 
-    # (actually half-period, since a full period is 2 zero crossings)
-    zc2 = np.concatenate((zc,np.zeros((1))))
-    zc3 = np.concatenate((np.zeros((1)),zc))
-    p = zc2 - zc3
-    p[-1] = p[-2]
-    # Create new array of periods @ fs
-    pfs = np.zeros(fsig.shape)
-    # Resample period data (aliased)
-    for k in range(zc.shape[0]-1):
-        pfs[zc[k]:zc[k+1]] = p[k]
-    pfs[0:zc[0]] = p[0]
-    pfs[zc[-1]:] = p[-2]
+    fsig = filtfilt(b,a,fsig,axis=0)
+    # Instantaneous half-period at each sample, from the zero crossings 
+    # (a full period is 2 zero crossings)
+    pfs = _half_periods(fsig.T, np.zeros(x.shape[1]), np.full(x.shape[1], np.nan))[0].T
     # Convert instantaneous period data to instantaneous frequency data
-    ps = ((pfs / (fs/1000.)) / 1000.)
     # The 2 here corrects for the half-period issue above
-    f = (1./ps)/2.
-    # Smooth the F0 track
-    b,a = filters.butter(1,16./(fs/2.))
-    f = filtfilt(b,a,f)
-    
-    # Voicing
-    env = envelope(fsig,fs)
-    env = env/np.max(np.abs(env))
+    with np.errstate(divide='ignore'):
+        f = np.where(pfs > 0, (fs / 2.) / pfs, 0)
+
+    if frame_rate is None:
+        # Smooth the F0 track
+        b,a = filters.butter(1,16./(fs/2.))
+        f = filtfilt(b,a,f,axis=0)
+        # Voicing
+        env = envelope((fsig - np.mean(fsig, axis=0)).T,fs).T
+        env_fs = fs
+    else:
+        # Frame means, by differencing cumulative sums
+        hop = fs / float(frame_rate)
+        edges = np.unique(np.minimum(np.round(np.arange(int(np.ceil(x.shape[0] / hop)) + 1) * hop), x.shape[0]).astype(int))
+        f = _frame_means(f, edges)
+        b,a = filters.butter(1,16./(frame_rate/2.))
+        f = filtfilt(b,a,f,axis=0,padlen=min(3,f.shape[0]-1))
+        # Voicing
+        rect = np.maximum(fsig - np.mean(fsig, axis=0), 0)
+        env_b,env_a = filters.butter(2,16./(frame_rate/2.))
+        env = filtfilt(env_b,env_a,_frame_means(rect, edges),axis=0,padlen=min(6,f.shape[0]-1))
+        env_fs = frame_rate
+    env = env/np.max(np.abs(env), axis=0)
     # Noise gate
-    env[20*np.log10(env)<-noisegate] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        env[20*np.log10(env)<-noisegate] = 0
     env[env>0] = 1
-#    env2 = env
-#    vonsets = array(where(sign(env[1:]) < sign(env[:-1]))).transpose()[:,0]
-#    print vonsets
-#    print vonsets + vdelay - 1
-#    skip = True
-#    for k in range(vonsets.shape[0]):
-#        if (skip):
-#            env2[vonsets[k]:vonsets[k] + vdelay - 1] = 0
-#            skip = False
-#        else:
-#            skip = True
     # Smooth the transitions
-    b,a = filters.butter(1,16./(fs/2.))
-    envf = filtfilt(b,a,env)
+    b,a = filters.butter(1,16./(env_fs/2.))
+    envf = filtfilt(b,a,env,axis=0,padlen=min(3*max(len(a),len(b)),env.shape[0]-1))
+
+    y = f * np.maximum(envf,0)
+    return y.reshape(y.shape[:1] + sig.shape[1:])
+
+
+class f0_tracker:
+    '''Estimates the fundamental frequency of a signal block by block
+
+        The method is that of f0, but with causal filters whose state is 
+        carried from one block to the next, and with the noise gate 
+        relative to the highest envelope so far. The pitch track is 
+        returned at a frame rate, and a frame is complete once the sample 
+        after it has been passed. The output does not depend on how the 
+        signal is divided into blocks, but, because the filters are not 
+        zero-phase, it can differ somewhat from that of f0.
+
+        Parameters
+        ----------
+        fs : scalar
+            The sampling frequency.
+        noisegate : scalar
+            Frames with envelopes more than noisegate dB below the peak so 
+            far are treated as unvoiced [default = 15]
+        frame_rate : scalar
+            The rate of the pitch track, in frames per second. Must be 
+            greater than 32 [default = 100]
+
+        Example
+        -------
+        >>> t = psylab.signal.f0_tracker(fs)
+        >>> for block in blocks:
+        ...     f = t.process(block)
+    '''
+    def __init__(self, fs, noisegate=15, frame_rate=100):
+        self.fs = fs
+        self.noisegate = noisegate
+        self.frame_rate = frame_rate
+        self.hop = fs / float(frame_rate)
+        # Each filter is applied twice, for the magnitude response of filtfilt
+        lp = filters.butter(4,270./(fs/2.),output='sos')
+        hp = filters.butter(4,60./(fs/2.),btype='high',output='sos')
+        self.sos = np.concatenate((lp, lp, hp, hp))
+        self.env_ba = filters.butter(2,16./(fs/2.))
+        self.smooth_ba = filters.butter(1,16./(frame_rate/2.))
+        self.reset()
+
+    def reset(self):
+        '''Clears the filter state
+        '''
+        self.zi = None
 
-    return f * np.maximum(envf,0)
-    #return f, np.maximum(env,0), np.maximum(env2,0)
-    #return maximum(envf,0)
+    def process(self, sig):
+        '''Adds a block of input and returns the completed frames
+
+            Parameters
+            ----------
+            sig : array
+                The next block. Samples are along axis 0, and columns (if 
+                2-d) are tracked independently.
+
+            Returns
+            -------
+            y : array
+                The pitch track of the frames completed by this block.
+        '''
+        sig = np.asarray(sig, dtype=float)
+        x = sig.reshape((sig.shape[0], -1))
+        nch = x.shape[1]
+        if self.zi is None:
+            self.zi = np.zeros((self.sos.shape[0], 2, nch))
+            self.zi_env = np.zeros((2, nch))
+            self.zi_f = np.zeros((1, nch))
+            self.zi_v = np.zeros((1, nch))
+            self.last = np.zeros((0, 2, nch))
+            self.prev = np.zeros(nch)
+            self.cur = np.zeros(nch)
+            self.peak = np.zeros(nch)
+            self.buf = np.zeros((0, 2, nch))
+            self.n = 0
+            self.frames = 0
+
+        fsig, self.zi = scipy.signal.sosfilt(self.sos, x, axis=0, zi=self.zi)
+        env, self.zi_env = lfilter(self.env_ba[0], self.env_ba[1], np.maximum(fsig, 0), axis=0, zi=self.zi_env)
+        # The last sample is held back until the next block, because a 
+        # crossing between it and the next sample changes its period
+        held = self.last.shape[0]
+        ext = np.concatenate((self.last[:, 0], fsig))
+        env = np.concatenate((self.last[:, 1], env))
+        self.last = np.stack((fsig[-1:], env[-1:]), axis=1)
+        pfs, self.prev, self.cur = _half_periods(ext.T, self.prev + held, self.cur)
+        pfs = pfs.T[:-1]
+        env = env[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = np.where(pfs > 0, (self.fs / 2.) / pfs, 0)
+
+        buf = np.concatenate((self.buf, np.stack((f, env), axis=1)))
+        start = self.n - self.buf.shape[0]
+        self.n += f.shape[0]
+        j = np.arange(self.frames, int(self.n / self.hop) + 1)
+        edges = np.round(j * self.hop).astype(int)
+        edges = edges[edges <= self.n] - start
+        if edges.size < 2:
+            self.buf = buf
+            return np.zeros((0,) + sig.shape[1:])
+        means = _frame_means(buf.reshape((buf.shape[0], -1)), edges).reshape((-1, 2, nch))
+        self.buf = buf[edges[-1]:]
+        self.frames += edges.size - 1
+
+        f, env = means[:, 0], means[:, 1]
+        peak = np.maximum.accumulate(np.concatenate((self.peak[np.newaxis], env)), axis=0)[1:]
+        self.peak = peak[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v = (20*np.log10(env / peak) >= -self.noisegate).astype(float)
+        b,a = self.smooth_ba
+        f, self.zi_f = lfilter(b, a, f, axis=0, zi=self.zi_f)
+        v, self.zi_v = lfilter(b, a, v, axis=0, zi=self.zi_v)
+        y = f * np.maximum(v, 0)
+        return y.reshape(y.shape[:1] + sig.shape[1:])
+
+
+def _half_periods(x, prev, cur):
+    '''Returns the half-period at each sample of each row of x
+
+        Each sample gets the interval between the last two zero crossings 
+        at or before it. prev is the index of the last crossing before x 
+        (relative to the start of x; ie., <= 0), and cur is the half-period 
+        before the first crossing (nan to use that of the first crossing). 
+        The updated prev (relative to the end of x) and cur are also 
+        returned.
+    '''
+    nrows, n = x.shape
+    s = np.sign(x)
+    rows, ks = np.nonzero(s[:, 1:] != s[:, :-1])
+    first = np.ones(rows.size, dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    last = np.ones(rows.size, dtype=bool)
+    last[:-1] = first[1:]
+    prev_k = np.empty(rows.size)
+    prev_k[1:] = ks[:-1]
+    prev_k[first] = prev[rows[first]]
+    p = ks - prev_k
+
+    cur = cur.copy()
+    undefined = np.isnan(cur[rows[first]])
+    cur[rows[first][undefined]] = p[first][undefined]
+    start = np.nan_to_num(cur)
+    # Expand the segment values to every sample, with one repeat
+    pos = np.concatenate((np.arange(nrows) * n, rows * n + ks))
+    vals = np.concatenate((start, p))
+    order = np.argsort(pos, kind='stable')
+    pos = pos[order]
+    lengths = np.diff(np.concatenate((pos, [nrows * n])))
+    pfs = np.repeat(vals[order], lengths).reshape((nrows, n))
+
+    prev = prev - n
+    prev[rows[last]] = ks[last] - n
+    cur[rows[last]] = p[last]
+    return pfs, prev, cur
+
+
+def _frame_means(x, edges):
+    '''Returns the means of x (along axis 0) between consecutive edges
+    '''
+    cs = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=cs[1:])
+    return (cs[edges[1:]] - cs[edges[:-1]]) / np.diff(edges).reshape((-1,) + (1,) * (x.ndim - 1))
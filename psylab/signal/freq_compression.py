@@ -24,8 +24,10 @@
 #
 
 import numpy as np
+import scipy.signal
 from numpy.fft import fft, ifft
-from . import interp
+from .interp import interp
+from .resample import resample, resampler, _ratio
 
 def tdhs(x, window, overlap):
     """Time-scale modification algorithm using overlap-add and windowing for
@@ -41,7 +43,8 @@ def tdhs(x, window, overlap):
     Parameters
     ----------
     x : ndarray
-        Time-domain representation of the signal.
+        Time-domain representation of the signal. If 2-d, each column 
+        (eg., each token of a batch) is scaled independently.
     window : ndarray
         Shape to ramp the summed timeslices of the signal.
     overlap : int
@@ -52,18 +55,34 @@ def tdhs(x, window, overlap):
     y : ndarray
         The time-scaled source signal.
     """
-    assert overlap <= len(window)
+    window = np.asarray(window)
+    window_size = window.size
+    overlap = int(overlap)
+    assert overlap <= window_size
+    x = np.asarray(x)
+    hop = window_size - overlap
 
-    y = np.zeros(x.size)
+    # Input frames abut, so they are a reshaped view of x. As in Mal79, the
+    # frame ending on the last sample of x is not used
+    nframes = max(x.shape[0] - 1, 0) // window_size
+    frames = x[:nframes * window_size].reshape((nframes, window_size) + x.shape[1:])
+    frames = frames * window.reshape((window_size,) + (1,) * (x.ndim - 1))
 
-    i = 0
-    j = 0
-    window_size = len(window)
-    while j+window_size < x.size:
-        y[i:i+window_size] += window * x[j:j+window_size]
-        i += window_size - overlap
-        j += window_size
-    return y
+    if hop == 0 or nframes == 0:
+        y = np.zeros(x.shape, dtype=frames.dtype)
+        if nframes:
+            y[:window_size] += frames.sum(axis=0)
+        return y
+    # Every r-th output frame is at least window_size samples from the
+    # last, so each of those r sets can be added in one operation
+    r = -(-window_size // hop)
+    span = r * hop
+    y = np.zeros((max((nframes + r) * hop + window_size, x.shape[0]),) + x.shape[1:], dtype=frames.dtype)
+    for k in range(min(r, nframes)):
+        g = frames[k::r]
+        view = y[k * hop:k * hop + g.shape[0] * span].reshape((g.shape[0], span) + x.shape[1:])
+        view[:, :window_size] += g
+    return y[:x.shape[0]]
 
 def solafs_offline(x, w_ov, s_s, s_a, k_max):
     """Time-domain scaling using the SOLAFS algorithm.
@@ -73,8 +92,10 @@ def solafs_offline(x, w_ov, s_s, s_a, k_max):
     alpha > 1 implies time-domain expansion,
     alpha < 1 implies time-domain compression.
     
-    Currently very low-performance due to lots of inefficient
-    arithmetic operations occurring at the Python level. 
+    For each frame, the normalized cross-correlation between the output 
+    overlap region and every candidate offset of the input is computed in 
+    one call (using fft-based correlation when that is faster), and the 
+    overlap-add is done with array operations.
     
     Parameters
     ----------
@@ -92,45 +113,160 @@ def solafs_offline(x, w_ov, s_s, s_a, k_max):
 
     k_max : int
         Maximum window offset for the next window to add.
+
+    Returns
+    -------
+    y : ndarray
+        The time-scaled signal, of length int(x.size * s_s / s_a). The input 
+        is zero-padded as needed to fill the final frames.
     """
     alpha = float(s_s)/s_a
-    beta = np.linspace(1,0,w_ov)
-
     w = s_s + w_ov
 
-    y = np.zeros(int(x.size * alpha))
+    size = int(x.size * alpha)
+    nframes = -(-size // s_s) # Enough frames to fill the output
+    y = np.zeros(nframes * s_s + w_ov)
+    # Pad so that every candidate segment can be read in full
+    xp = np.concatenate((x, np.zeros(max(nframes * s_a + k_max + w - x.size, 0))))
+    beta = np.linspace(1, 0, w_ov)
+
+    for m in range(nframes):
+        k_m = _solafs_offset(xp[m*s_a:m*s_a + k_max + w_ov], y[m*s_s:m*s_s + w_ov], k_max)
+        x_m = xp[m*s_a + k_m:m*s_a + k_m + w]
+        y_ov = y[m*s_s:m*s_s + w_ov]
+        y_ov *= beta
+        y_ov += (1 - beta) * x_m[:w_ov]
+        y[m*s_s + w_ov:m*s_s + w] = x_m[w_ov:]
+
+    return y[:size]
+
+
+class solafs:
+    """Time-domain scaling using the SOLAFS algorithm, block by block
+
+    The streaming counterpart of solafs_offline. Blocks of any size can be 
+    passed to process, which returns whatever output is complete so far 
+    (a multiple of s_s samples). Concatenating the outputs, followed by 
+    that of flush, yields the same samples as solafs_offline.
+
+    Parameters
+    ----------
+    w_ov : int
+        Window overlap in samples.
+    s_s : int
+        Synthesis distance in samples.
+    s_a : int
+        Analysis distance in samples.
+    k_max : int
+        Maximum window offset for the next window to add.
+
+    Example
+    -------
+    >>> tds = solafs(100, 400, 500, 100)
+    >>> for block in blocks:
+    ...     y = tds.process(block)
+    """
+    def __init__(self, w_ov, s_s, s_a, k_max):
+        self.w_ov = int(w_ov)
+        self.s_s = int(s_s)
+        self.s_a = int(s_a)
+        self.k_max = int(k_max)
+        self.beta = np.linspace(1, 0, self.w_ov)
+        self.reset()
+
+    def reset(self):
+        """Clears the input and output buffers
+        """
+        self.x = np.zeros(0)
+        self.y = np.zeros(self.w_ov)
+        self.n_in = 0
+        self.n_out = 0
+
+    def process(self, sig):
+        """Adds a block of input and returns the completed output
+
+            Parameters
+            ----------
+            sig : array
+                The next 1-d block of the input signal
 
-    for m in xrange(0, ((y.size - w) / s_s)):
-        x_m = np.zeros(w)
+            Returns
+            -------
+            y : array
+                The output completed so far.
+        """
+        self.x = np.concatenate((self.x, sig))
+        self.n_in += len(sig)
+        w = self.s_s + self.w_ov
+        need = self.k_max + w
+        out = []
+        while self.x.size >= need:
+            out.append(self._frame())
+        if out:
+            return np.concatenate(out)
+        return np.zeros(0)
 
-        r = np.zeros(k_max+1)
-        for k in xrange(0, k_max+1):
-            a = np.sum([x[m*s_a + k + n] * y[m * s_s + n] for n in xrange(0, w_ov)])
-            b = np.sum([x[m*s_a + k + n]**2 for n in xrange(0, w_ov)])
-            c = np.sum([y[m*s_s + n] for n in xrange(0, w_ov)])
-            r[k] = a / (np.sqrt(b) * np.sqrt(c))
+    def flush(self):
+        """Completes the output once all of the input has been passed
 
-        k_m = 0
-        k_m_corr = r[0]
-        if np.isnan(k_m_corr):
-            k_m_corr = 0
-        for k in xrange(1, r.size):
-            if np.isfinite(r[k]):
-                if r[k] > k_m_corr:
-                    k_m = k
-                    k_m_corr = r[k]
+            The input is zero-padded to complete any remaining frames, and 
+            the output is padded to a total length of int(n_in * s_s / s_a), 
+            as with solafs_offline.
 
-        for n in xrange(0, w):
-            i = m * s_a + k_m + n
-            if i < x.size:
-                x_m[n] = x[i]
+            Returns
+            -------
+            y : array
+                The remaining output.
+        """
+        w = self.s_s + self.w_ov
+        size = int(self.n_in * float(self.s_s) / self.s_a)
+        n = self.n_out
+        out = [np.zeros(0)]
+        while self.n_out < size:
+            self.x = np.concatenate((self.x, np.zeros(max(self.k_max + w - self.x.size, 0))))
+            out.append(self._frame())
+        return np.concatenate(out)[:max(size - n, 0)]
 
-        for n in xrange(0, w_ov):
-            y[m * s_s + n] = beta[n]*y[m * s_s + n] + (1-beta[n])*x_m[n]
-        for n in xrange(w_ov, w):
-            y[m * s_s + n] = x_m[n]
+    def _frame(self):
+        w = self.s_s + self.w_ov
+        k_m = _solafs_offset(self.x[:self.k_max + self.w_ov], self.y, self.k_max)
+        x_m = self.x[k_m:k_m + w]
+        out = np.empty(self.s_s)
+        n = min(self.w_ov, self.s_s)
+        y_ov = self.beta * self.y + (1 - self.beta) * x_m[:self.w_ov]
+        out[:n] = y_ov[:n]
+        out[n:] = x_m[self.w_ov:self.s_s]
+        # The tail of this frame is the overlap region of the next one
+        self.y = x_m[self.s_s:w].copy()
+        if self.w_ov > self.s_s:
+            self.y[:self.w_ov - self.s_s] = y_ov[self.s_s:]
+        self.x = self.x[self.s_a:]
+        self.n_out += self.s_s
+        return out
 
-    return y
+
+def _solafs_offset(xr, y_ov, k_max):
+    """Returns the offset (0 to k_max) of xr that best matches y_ov
+
+        The match is measured as the normalized cross-correlation between 
+        y_ov and each w_ov-sample segment of xr. Offsets where it is not 
+        finite (eg., silence) are skipped, and 0 is returned if none of 
+        the offsets correlate positively.
+    """
+    w_ov = y_ov.size
+    if w_ov == 0:
+        return 0
+    xr = xr[:k_max + w_ov]
+    a = scipy.signal.correlate(xr, y_ov, mode='valid')
+    e = np.concatenate(([0.], np.cumsum(xr**2)))
+    b = np.maximum(e[w_ov:] - e[:-w_ov], 0)
+    c = np.dot(y_ov, y_ov)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = a / (np.sqrt(b) * np.sqrt(c))
+    if not np.isfinite(r[0]):
+        r[0] = 0
+    r[~np.isfinite(r)] = -np.inf
+    return int(np.argmax(r))
 
 def freq_compress(x, semitones, 
                   window=400,
@@ -141,7 +277,8 @@ def freq_compress(x, semitones,
     Parameters
     ----------
     x : numpy.ndarray
-        Array of samples
+        Array of samples. For tdhs, this can be 2-d, in which case each 
+        column (eg., each token of a batch) is compressed.
     
     semitones : int
         Number of semitones by which to compress the pitch.
@@ -171,12 +308,110 @@ def freq_compress(x, semitones,
     w_ov = (1 - 1./alpha) * window
     if tdsalg == "tdhs":
         y = tdhs(x, w, w_ov)
-        y = interp.interp(y, int(x.size * alpha))[:x.size]
+        up, down = _ratio(alpha)
+        y = resample(y, up, down)[:x.shape[0]]
         return y
     elif tdsalg == "solafs":
         y = solafs_offline(x, int(w_ov), window, int(window*alpha), k_max)
-        y = interp.interp(y, int(x.size))
+        y = interp(y, x.size)
         return y
     else:
         raise ValueError("`tdsalg` must be 'tdhs' or 'solafs'.")
 
+
+class freq_compressor(object):
+    """Performs tdhs frequency compression block by block
+
+        The tdhs overlap-add and the resampler both carry their state from 
+        one block to the next, so that the concatenated output of process 
+        followed by flush is the same as that of freq_compress with 
+        tdsalg="tdhs" on the whole signal.
+
+        Parameters
+        ----------
+        semitones : int
+            Number of semitones by which to compress the pitch.
+        window : scalar
+            The size of the sampling window.
+
+        Example
+        -------
+        >>> c = psylab.signal.freq_compressor(3)
+        >>> y = np.concatenate([c.process(block) for block in blocks] + [c.flush()])
+    """
+    def __init__(self, semitones, window=400):
+        self.window = np.hanning(window)
+        alpha = (2.0)**(float(semitones)/12)
+        self.overlap = int((1 - 1./alpha) * window)
+        self.hop = self.window.size - self.overlap
+        self.resampler = resampler(*_ratio(alpha))
+        self.reset()
+
+    def reset(self):
+        """Clears the input, overlap-add and resampler buffers
+        """
+        self.x = None
+        self.y = None
+        self.n_in = 0
+        self.n_tdhs = 0
+        self.n_out = 0
+        self.resampler.reset()
+
+    def process(self, sig):
+        """Adds a block of input and returns the completed output
+
+            Parameters
+            ----------
+            sig : array
+                The next block of the input signal. Samples are along 
+                axis 0, and columns (if 2-d) are compressed independently.
+
+            Returns
+            -------
+            y : array
+                The output completed so far.
+        """
+        sig = np.asarray(sig)
+        if self.x is None:
+            self.x = sig[:0]
+            self.y = np.zeros((max(self.overlap, 0),) + sig.shape[1:])
+        self.x = np.concatenate((self.x, sig))
+        self.n_in += sig.shape[0]
+        ws = self.window.size
+        nframes = max(self.x.shape[0] - 1, 0) // ws
+        if nframes == 0:
+            return self._out(self.resampler.process(self.x[:0]))
+        y = tdhs(self.x[:nframes * ws + 1], self.window, self.overlap)
+        n = self.y.shape[0]
+        y[:n] += self.y
+        done = nframes * self.hop
+        self.y = y[done:done + n].copy()
+        self.x = self.x[nframes * ws:]
+        self.n_tdhs += done
+        return self._out(self.resampler.process(y[:done]))
+
+    def flush(self):
+        """Completes the output once all of the input has been passed
+
+            Returns
+            -------
+            y : array
+                The remaining output, so that the total is as long as the 
+                input.
+        """
+        if self.x is None:
+            return np.zeros(0)
+        # freq_compress keeps n_in tdhs samples: the pending overlap, then zeros
+        n = self.n_in - self.n_tdhs
+        y = np.zeros((max(n, 0),) + self.x.shape[1:])
+        m = min(self.y.shape[0], y.shape[0])
+        y[:m] = self.y[:m]
+        self.n_tdhs += y.shape[0]
+        y = np.concatenate((self.resampler.process(y), self.resampler.flush()))
+        return self._out(y, self.n_in)
+
+    def _out(self, y, n=None):
+        if n is not None:
+            y = y[:max(n - self.n_out, 0)]
+        self.n_out += y.shape[0]
+        return y
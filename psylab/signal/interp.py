@@ -23,13 +23,23 @@
 # cbrown1@pitt.edu.
 #
 
+import math
 import numpy as np
+import scipy.signal
 from scipy import interpolate
+from .resample import resample
 
-def interp(sig, n, kind='linear'):
+# Exact ratios with a larger up or down factor are resampled with FFTs
+_MAX_POLYPHASE = 4096
+
+def interp(sig, n, kind='polyphase', axis=0):
     '''Returns y interpolated to n points using specified interpolation
      
-        This is just a convenience function that wraps scipy's interp1d.
+        By default, the signal is resampled by exactly n / sig.size, with a 
+        polyphase filter (see resample). If that ratio, reduced, needs an 
+        up or down factor larger than 4096, scipy.signal.resample (FFT 
+        based) is used instead. Any other kind is passed to scipy's 
+        interp1d.
 
         Parameters
         ----------
@@ -38,20 +48,33 @@ def interp(sig, n, kind='linear'):
         n : scalar
             The number of points to interpolate to.
         kind: str or int
-            The type of interpolation to use. This gets passed as is to the 
+            The type of interpolation to use. 'polyphase' (the default) 
+            uses resample. Otherwise, this gets passed as is to the 
             'kind' parameter of scipy.interpolate.interp1d. Can be 'zero' 
-            (completely aliased), 'lin', and so on. Consult the scipy 
+            (completely aliased), 'linear', and so on. Consult the scipy 
             function's docstring for more info.
+        axis : int
+            The axis along which to interpolate. Default = 0
         
         Returns
         -------
         y : array
             The interpolated signal.
 '''
+    sig = np.asarray(sig)
+    n = int(n)
+    size = sig.shape[axis]
+    if kind == 'polyphase':
+        g = math.gcd(n, size)
+        up, down = n // g, size // g
+        if max(up, down) > _MAX_POLYPHASE:
+            return scipy.signal.resample(sig, n, axis=axis)
+        # ceil(size * up / down) is exactly n
+        return resample(sig, up, down, axis=axis)
 
-    x = np.linspace(0,sig.size,sig.size)
-    xx = np.linspace(0,sig.size,n)
-    f = interpolate.interp1d(x,sig)
+    x = np.linspace(0,size,size)
+    xx = np.linspace(0,size,n)
+    f = interpolate.interp1d(x,sig,kind=kind,axis=axis)
     yy = f(xx)
 
     return(yy)
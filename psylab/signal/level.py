@@ -30,6 +30,7 @@ Sound power (sound intensity) is the cause and sound pressure is the effect.
 """
 
 import numpy as np
+from .atten import _apply_gain
 
 hl_conversion = {
             125: 45.0,
@@ -45,24 +46,32 @@ hl_conversion = {
             8000: 15.5,
             }
 
+def _hl_conversion(f):
+    """ Looks up the hl conversion for each frequency in f
+
+    """
+    f = np.asarray(f)
+    if not np.all(np.isin(f, list(hl_conversion.keys()))):
+        raise ValueError("Invalid frequency; must be an audiometric octave or half-octave frequency. Specifically, one of:\n{:}".format(list(hl_conversion.keys())))
+    if f.ndim == 0:
+        return hl_conversion[f.item()]
+    return np.array([hl_conversion[fi] for fi in f.ravel()]).reshape(f.shape)
+
+
 def spl2hl(spl, f):
     """ Converts Sound Pressure Level (SPL) to Hearing Level (HL)
 
+        f can be a scalar or an array of audiometric frequencies.
     """
-    if f in hl_conversion.keys():
-        return spl + hl_conversion[f]
-    else:
-        raise "Invalid frequency; must be an audiometric octave or half-octave frequency. Specifically, one of:\n{:}".format(hl_conversion.keys())
+    return spl + _hl_conversion(f)
 
 
 def hl2spl(hl, f):
     """ Converts Hearing Level (HL) to Sound Pressure Level (SPL)
 
+        f can be a scalar or an array of audiometric frequencies.
     """
-    if f in hl_conversion.keys():
-        return hl - hl_conversion[f]
-    else:
-        raise "Invalid frequency; must be an audiometric octave or half-octave frequency. Specifically, one of:\n{:}".format(hl_conversion.keys())
+    return hl - _hl_conversion(f)
 
 
 def spl2n0(spl, fc, bw):
@@ -109,3 +118,41 @@ def si2spl(si):
     ref = .000000000001 # Standard reference of 10**−12 W/m2
     spl = 10*np.log10(si/ref)
     return spl
+
+
+def calibrate(data, spl, cal=None, axis=0, out=None):
+    """Scales a signal so that its rms is a Sound Pressure Level (dB SPL)
+
+    The rms is computed along axis (eg., per channel), and the scaling is 
+    then done in one pass, in place if out is data. Float32 input stays 
+    float32.
+
+    Parameters
+    ----------
+    data : array
+        The input signal.
+    spl : scalar or array
+        The desired level, in dB SPL. An array gives one level per channel.
+    cal : scalar
+        The level, in dB SPL, of a signal with an rms of 1 (ie., the 
+        calibration of the playback system). If None [default], the output 
+        is in Pascals, re 20 uPa.
+    axis : int
+        The time axis [default = 0].
+    out : array
+        An optional array to write the output into, which can be data itself. 
+        If it is an integer array, the output is rounded and clipped.
+
+    Returns
+    -------
+    y : array
+        The scaled signal.
+    """
+    data = np.asarray(data)
+    rms = np.sqrt(np.mean(np.square(data, dtype=float), axis=axis, keepdims=True))
+    spl = np.expand_dims(np.asarray(spl, dtype=float), axis) if np.ndim(spl) else float(spl)
+    if cal is None:
+        target = spl2sp(spl)
+    else:
+        target = np.power(10., (spl - cal) / 20.)
+    return _apply_gain(data, np.asarray(target / rms), out)
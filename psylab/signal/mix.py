@@ -24,9 +24,9 @@
 #
 
 import numpy as np
-from .zeropad import zeropad
+from .ramps import ramps
 
-def mix( *args, **kwargs ):
+def mix(*args, offsets=None, as_channels=False, gains=None, out=None):
     '''Mixes [adds] signals at specified offsets, zero padding as needed
 
         This function may be useful when you need to combine two or more 
@@ -36,10 +36,14 @@ def mix( *args, **kwargs ):
         pain in the ass with numpy, which makes working with both 1-d and 2-d 
         arrays tedious (eg., look at all the if statements in the code). 
 
+        The length of the output is computed from the offsets first, so 
+        that it is allocated once, and each signal is added to it in place.
+
         Parameters
         ----------
-        args : tuple of 1-d arrays
-            A number of arrays to be combined.
+        args : tuple of 1-d or 2-d arrays
+            A number of arrays to be combined. 2-d arrays have channels 
+            along dim 1.
         offsets : list of scalars
             An optional list of offset values, in samples. Should be either
             ommitted or set to `None` for no offsets. The list will be zero-
@@ -48,7 +52,17 @@ def mix( *args, **kwargs ):
         as_channels : bool
             True to combine signals along dim 1 (ie., as separate audio 
             channels), False to sum all signals into a single channel 
-            [default = False]
+            [default = False]. When summing, 1-d signals are added to each 
+            channel of any 2-d signals.
+        gains : list of scalars
+            An optional list of gains, in dB, to apply to each signal. 
+            Positive values increase level. Padded with 0 dB, or truncated, 
+            like offsets.
+        out : array
+            An optional array to write the output into. It must have the 
+            shape of the output, and is overwritten. The default is a new 
+            array, which is float32 if all of the inputs are float32, and 
+            float64 otherwise.
 
         Returns
         -------
@@ -63,41 +77,145 @@ def mix( *args, **kwargs ):
         >>>b = np.ones(5)*4  # 5 four's
         >>>c = np.ones(10)*-3  # 10 negative three's
         >>>mix(a,b)
-        array([ 3.,  3.,  3.,  2.,  2.])
+        array([ 5.,  5.,  5.,  4.,  4.])
         >>>mix(a,b,offsets=[1]) # offset a by 1
-        array([ 2.,  3.,  3.,  3.,  2.])
+        array([ 4.,  5.,  5.,  5.,  4.])
         >>>mix(a,b,c,offsets=[0,5]) # offset a by 0 and b by 5
         array([-2., -2., -2., -3., -3.,  1.,  1.,  1.,  1.,  1.])
+        >>>mix(a,b,gains=[0,-6.0206]) # b at half amplitude
+        array([ 3.,  3.,  3.,  2.,  2.])
 
     '''
-    out = np.zeros((1,))
-
-    if 'offsets' in kwargs and kwargs['offsets'] is not None:
-        offsets_a = np.array(kwargs['offsets'])
-        if len(offsets_a) < len(args):
-            offsets_a = np.hstack((offsets_a,np.zeros(len(args)-len(offsets_a))))
-        elif len(offsets_a) > len(args):
-            offsets = offsets_a[:len(args)]
-        offsets = list(offsets_a)
+    args = [np.asarray(sig) for sig in args]
+    offsets = _per_signal(offsets, len(args)).astype(int)
+    if np.any(offsets < 0):
+        raise ValueError("Offsets cannot be negative")
+    gains = 10 ** (_per_signal(gains, len(args)) / 20.)
+
+    length = max([off + sig.shape[0] for sig,off in zip(args,offsets)] + [1])
+    widths = [1 if sig.ndim == 1 else sig.shape[1] for sig in args]
+    if as_channels:
+        shape = (length, sum(widths))
+    elif any(sig.ndim > 1 for sig in args):
+        shape = (length, max(widths))
     else:
-        offsets = list(np.zeros(len(args)))
-        
-    if 'as_channels' in kwargs and kwargs['as_channels'] is not None:
-        as_channels = kwargs['as_channels']
+        shape = (length,)
+    if out is None:
+        dtype = np.float32 if all(sig.dtype == np.float32 for sig in args) else np.float64
+        out = np.zeros(shape, dtype=dtype)
     else:
-        as_channels = False
+        if out.shape != shape:
+            raise ValueError("out must have shape {}".format(shape))
+        out[...] = 0
 
-    for sig,off in zip(args,offsets):
-        if len(sig.shape) == 1:
-            prepad = np.zeros((off,))
-        else:
-            prepad = np.zeros((off,sig.shape[1]))
-        this = np.concatenate((prepad, sig))
-        this,out = zeropad(this,out)
+    ch = 0
+    for sig,off,gain,width in zip(args,offsets,gains,widths):
         if as_channels:
-            out = np.vstack((out.T,this.T)).T
+            dest = out[off:off+sig.shape[0], ch:ch+width]
+            ch += width
         else:
-            out = out + this
-    if as_channels:
-        out = out[:,1:] # Channel 1 is all zeros (from instantiation), so remove
+            dest = out[off:off+sig.shape[0]]
+        if sig.ndim == 1 and dest.ndim == 2:
+            sig = sig[:, np.newaxis]
+        if gain == 1:
+            dest += sig
+        else:
+            dest += gain * sig
     return out
+
+
+def mix_snr(target, masker, snrs, fs=None, fixed='target', level=None, start=0, ramp=None, seed=None):
+    '''Mixes a target and a masker at each of a number of signal-to-noise ratios
+
+        The rms of the target and of the masker are each computed once, and 
+        all of the mixtures are made together, one per row of the output.
+
+        Parameters
+        ----------
+        target : array
+            The target signal. A 2-d array has channels along dim 1, and its 
+            rms is computed over all channels.
+        masker : array
+            The masker signal. It must have the same number of channels as 
+            the target, and at least as many samples. If it is longer, an 
+            excerpt the length of the target is used (see start).
+        snrs : scalar or array
+            The signal-to-noise ratios, in dB.
+        fs : scalar
+            The sampling frequency. Only needed for ramps.
+        fixed : str
+            Which signal is held at a constant level as snr changes: 
+            'target' [default] or 'masker'.
+        level : scalar
+            The rms, in dB re 1, to set the fixed signal to. Default is to 
+            leave it as is.
+        start : int or str
+            The first sample of the masker excerpt [default = 0]. 'random' 
+            picks a different random excerpt for each snr, and the rms of 
+            each excerpt is used.
+        ramp : scalar
+            The duration, in ms, of raised cosine ramps to apply to the 
+            onset and offset of each mixture. Default is no ramps.
+        seed : int
+            The seed for the random excerpts.
+
+        Returns
+        -------
+        y : array
+            The mixtures, of shape (snrs, samples) + any channels.
+
+        Examples
+        --------
+        >>>snrs = np.arange(-12, 13, 3)
+        >>>y = mix_snr(sentence, babble, snrs, fs, start='random', ramp=10)
+        >>>y.shape
+        (9, 44100)
+    '''
+    target = np.asarray(target)
+    masker = np.asarray(masker)
+    snrs = np.atleast_1d(np.asarray(snrs, dtype=float))
+    n = target.shape[0]
+    if masker.shape[0] < n or masker.shape[1:] != target.shape[1:]:
+        raise ValueError("masker must have the channels of target, and at least as many samples")
+    if not fixed in ['target', 'masker']:
+        raise ValueError("fixed must be 'target' or 'masker'")
+
+    # Each masker excerpt is a row of a strided view
+    excerpts = np.lib.stride_tricks.as_strided(masker, 
+        shape=(masker.shape[0] - n + 1,) + target.shape, strides=(masker.strides[0],) + masker.strides)
+    power = np.sum(np.reshape(masker**2., (masker.shape[0], -1)), axis=1) / target[0].size
+    energy = np.concatenate(([0], np.cumsum(power)))
+    if start == 'random':
+        starts = np.random.RandomState(seed).randint(0, excerpts.shape[0], snrs.size)
+    else:
+        starts = np.full(snrs.size, int(start))
+    t_rms = np.sqrt(np.mean(target**2.))
+    m_rms = np.sqrt(np.maximum(energy[starts + n] - energy[starts], 0) / n)
+
+    ratio = 10 ** (snrs / 20.)
+    if fixed == 'target':
+        g_t = np.ones(snrs.size)
+        g_m = t_rms / (m_rms * ratio)
+        ref = t_rms
+    else:
+        g_t = m_rms * ratio / t_rms
+        g_m = np.ones(snrs.size)
+        ref = m_rms
+    if level is not None:
+        scale = 10 ** (level / 20.) / ref
+        g_t = g_t * scale
+        g_m = g_m * scale
+
+    shape = (snrs.size,) + (1,) * target.ndim
+    out = g_t.reshape(shape) * target
+    out += g_m.reshape(shape) * excerpts[starts]
+    if ramp:
+        ramps(out, fs, ramp, axis=1, inplace=True)
+    return out
+
+
+def _per_signal(values, n):
+    '''Returns values as an array of length n, zero-padded or truncated
+    '''
+    values = np.zeros(n) if values is None else np.asarray(values, dtype=float).ravel()[:n]
+    return np.concatenate((values, np.zeros(n - values.size)))
@@ -24,9 +24,9 @@
 #
 
 import numpy as np
-from .window import sliding_window
+from .window import sliding_window, windower
 
-def pick_peaks(sig, n, window_size):
+def pick_peaks(sig, n, window_size, expand=True):
     """ A peak picking strategy
         Slides an rms window through the channels of signal, then picks n 
         peaks. Assumes a 2d array with data along axis 0, channels on axis 1.
@@ -44,19 +44,23 @@ def pick_peaks(sig, n, window_size):
             of channels (specified by axis 1 of the input array)
         window_size : scalar
             The size of the analysis window, in samples
+        expand : bool
+            If True (the default), each window's peaks are repeated for 
+            each of its samples. If False, there is one row per window, 
+            which can be expanded later (or in part) with expand_peaks.
 
         Returns
         -------
         ch : array
             The array of peaks. the length will be sig.length / window_size
-            and the width (axis=1) will be equal to sig
+            (times window_size, if expand is True) and the width (axis=1) 
+            will be n
         rms : array
             The array of windowed rms values
 
         Notes
         -----
-        The order of each output array is from lowest to highest rms, not 
-        from lowest to highest channel
+        Within each window, the channels are in ascending order
         
         Depends on sliding_window, a vectorized windowing function
         
@@ -76,23 +80,129 @@ def pick_peaks(sig, n, window_size):
     # Number of channels is set by axis 1 of sig (sig must be 2d)
     if len(sig.shape) != 2:
         raise ValueError("Sig must be 2d")
+    window_size = int(window_size)
     m = sig.shape[1]
     # Compute rms in each window in each channel
     # (overlap is not used here, but it's available in the function)
-    rms = np.sqrt(np.mean(sliding_window(sig,(window_size,m))**2,axis=1))
-    # Sort & take last n indexes, along dim 1
-    peak_channels = np.argsort(rms,1)[:,-n:]
-    peak_channels.sort(axis=1)
-    
-    peak_channels = peak_channels.repeat(window_size, axis=0)
-    rms = rms.repeat(window_size,axis=0)
-    
-    indices = peak_channels.ravel() + np.repeat(range(0, rms.shape[1]*rms.shape[0], rms.shape[1]), peak_channels.shape[1])
-    peak_rms = rms.ravel()[indices]
-    peak_rms = peak_rms.reshape(peak_channels.shape)
-    
-#    # Do the same for rms
-#    rms.sort()
-#    peak_rms = rms[:,-n:]
-    
+    frames = sliding_window(sig,(window_size,m),flatten=False)[:,0]
+    rms = np.sqrt(np.einsum('fwm,fwm->fm', frames, frames) / window_size)
+    peak_channels, peak_rms = _select(rms, n)
+    if expand:
+        return expand_peaks(peak_channels, peak_rms, window_size)
     return peak_channels,peak_rms
+
+
+def expand_peaks(ch, rms, window_size, start=0, stop=None):
+    """Repeats frame-rate peaks for each sample, between two samples
+
+        Parameters
+        ----------
+        ch, rms : arrays
+            The frame-rate channel indexes and rms values, as returned by 
+            pick_peaks with expand=False
+        window_size : scalar
+            The size of the analysis window, in samples
+        start, stop : int
+            The range of samples to return. Default = all
+
+        Returns
+        -------
+        ch, rms : arrays
+            The peaks at each sample from start to stop.
+    """
+    window_size = int(window_size)
+    if stop is None:
+        stop = ch.shape[0] * window_size
+    frames = np.arange(start, stop) // window_size
+    return ch[frames], rms[frames]
+
+
+def apply_peaks(sig, ch, rms, window_size):
+    """Returns the peak channels of sig, scaled by their rms
+
+        For synthesis (eg., an 'n of m' vocoder): each sample of each 
+        selected channel of sig (eg., the carriers) is multiplied by the 
+        rms of that channel in its window. This is done window by window, 
+        without expanding ch and rms to the sample rate.
+
+        Parameters
+        ----------
+        sig : array
+            The signal to select from, with channels along axis 1
+        ch, rms : arrays
+            The frame-rate peaks, as returned by pick_peaks with 
+            expand=False
+        window_size : scalar
+            The size of the analysis window, in samples
+
+        Returns
+        -------
+        y : array
+            The selected channels, with one column per peak. Samples after 
+            the last full window are 0.
+    """
+    window_size = int(window_size)
+    nframes = ch.shape[0]
+    out = np.zeros((sig.shape[0], ch.shape[1]), dtype=np.result_type(sig.dtype, rms.dtype))
+    frames = sig[:nframes*window_size].reshape((nframes, window_size, sig.shape[1]))
+    np.multiply(np.take_along_axis(frames, ch[:, np.newaxis, :], axis=2), rms[:, np.newaxis, :], 
+                out=out[:nframes*window_size].reshape((nframes, window_size, ch.shape[1])))
+    return out
+
+
+class peak_picker:
+    """Picks peaks window by window, from a stream of multichannel samples
+
+        Samples can be passed in blocks of any size. Each time a window is 
+        completed, its peaks are picked as in pick_peaks.
+
+        Parameters
+        ----------
+        n : scalar
+            The number of peaks to select in each window
+        window_size : scalar
+            The size of the analysis window, in samples
+
+        Example
+        -------
+        >>> p = peak_picker(8, 80)
+        >>> for block in envelopes:
+        ...     ch, rms = p.process(block)
+    """
+    def __init__(self, n, window_size):
+        self.n = n
+        self.window_size = int(window_size)
+        self.reset()
+
+    def reset(self):
+        """Clears the partial window
+        """
+        self.windower = windower(self.window_size)
+
+    def process(self, sig):
+        """Adds samples and returns the peaks of the windows they complete
+
+            Parameters
+            ----------
+            sig : array
+                The next samples, with channels along axis 1
+
+            Returns
+            -------
+            ch, rms : arrays
+                One row for each completed window (possibly none).
+        """
+        frames = self.windower.process(sig)
+        rms = np.sqrt(np.einsum('fwm,fwm->fm', frames, frames) / self.window_size)
+        return _select(rms, self.n)
+
+
+def _select(rms, n):
+    """Returns the n highest channels of each row of rms, and their rms
+    """
+    m = rms.shape[1]
+    n = min(int(n), m)
+    # Take the last n indexes of a partial sort, along dim 1
+    peak_channels = np.argpartition(rms, m-n, axis=1)[:, m-n:]
+    peak_channels.sort(axis=1)
+    return peak_channels, np.take_along_axis(rms, peak_channels, axis=1)
@@ -23,12 +23,16 @@
 # cbrown1@pitt.edu.
 #
 
+import functools
 import numpy as np
-from scipy import hanning, hamming
 
-def ramps(data, fs, duration=10, shape='raisedcosine', set='onoff'):
+def ramps(data, fs, duration=10, shape='raisedcosine', set='onoff', axis=0, inplace=False):
     '''Applies ramps to the onsets and/or offsets of a signal
         
+        Only the samples within the ramps are changed, so with inplace=True 
+        the cost depends on the duration of the ramps and not of the signal. 
+        Ramps are computed once for each duration, fs and shape, and reused.
+
         Parameters
         ----------
         sig : array
@@ -48,6 +52,13 @@ def ramps(data, fs, duration=10, shape='raisedcosine', set='onoff'):
               'on' : apply to onset of signal only
               'off' : apply to offest only
               'onoff' : apply to both
+        axis : int
+            The time axis [default = 0]. The ramps are applied to all 
+            channels, trials, etc along the other axes.
+        inplace : bool
+            If True, the ramps are applied to the input array (which must 
+            be floating point), and it is returned. Otherwise [default], the 
+            input is copied first.
         
         Returns
         -------
@@ -55,38 +66,54 @@ def ramps(data, fs, duration=10, shape='raisedcosine', set='onoff'):
             The ramped signal.
         
     '''
-    dur = np.int(np.round(np.float32(duration)*(np.float32(fs)/1000.)))
-    wspace=np.round(2.*dur)
+    if not set in ['on', 'off', 'onoff']:
+        raise ValueError("set not recognized")
+    on, off = _ramps(float(duration), float(fs), shape)
+    if not set in ['on', 'onoff']:
+        on = on[:0]
+    if not set in ['off', 'onoff']:
+        off = off[:0]
+
+    data = np.asarray(data)
+    if not inplace:
+        dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.float64
+        data = np.array(data, dtype=dtype)
+    y = np.moveaxis(data, axis, 0)
+    n = y.shape[0]
+    bshape = (-1,) + (1,) * (y.ndim - 1)
+    if on.size + off.size > n:
+        # The ramps overlap, and the offset ramp takes precedence
+        f_ramp = np.ones(n)
+        f_ramp[:on.size] = on[:n]
+        f_ramp[max(n - off.size, 0):] = off[max(off.size - n, 0):]
+        y *= f_ramp.reshape(bshape)
+    else:
+        y[:on.size] *= on.reshape(bshape)
+        y[n - off.size:] *= off.reshape(bshape)
+    return data
+
 
-    if shape is 'raisedcosine':
+@functools.lru_cache(maxsize=32)
+def _ramps(duration, fs, shape):
+    '''Returns the onset and offset ramps for a duration (ms), fs and shape
+    '''
+    dur = int(np.round(np.float32(duration)*(np.float32(fs)/1000.)))
+    wspace = 2*dur
+
+    if shape == 'raisedcosine':
         rf = np.power((((np.cos(np.pi+2*np.pi*np.arange(0,wspace-1)/(wspace-1)))*.5)+.5),2)
-    elif shape is 'hanning':
-        rf = hanning(wspace)
-    elif shape is 'hamming':
-        rf = hamming(wspace)
-    elif shape is 'linear':
+    elif shape == 'hanning':
+        rf = np.hanning(wspace)
+    elif shape == 'hamming':
+        rf = np.hamming(wspace)
+    elif shape == 'linear':
         r = np.linspace(0, 1, dur)
         rf = np.concatenate((r, r[::-1]))
     else:
-        raise Exception("shape not recognized")
-    
-    f_ramp = np.ones(data.shape[0])
-    if set in ['on', 'onoff']:
-        f_ramp[0:dur] = rf[0:dur]
-    if set in ['off', 'onoff']:
-        durp1 = dur-1
-        f_ramp[-(durp1):] = rf[-(durp1):]
-
-#    if len(data.shape) == 2:
-#        f_ramp_1d = rf.copy()
-#        for c in range(data.shape[1]-1):
-#            f_ramp = np.column_stack((f_ramp, f_ramp_1d))
+        raise ValueError("shape not recognized")
 
-    return (data.T * f_ramp).T
-#    y = data
-#    if set in ['on', 'onoff']:
-#        y[0:dur,] = y[0:dur,]*rf[0:dur,]
-#    if set in ['off', 'onoff']:
-#        durp1 = dur-1
-#        y[-(durp1):,] = y[-(durp1):,]*rf[-(durp1):,]
-#    return y
+    on = rf[:dur].copy()
+    off = rf[rf.size - max(dur - 1, 0):].copy()
+    on.flags.writeable = False
+    off.flags.writeable = False
+    return on, off
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of Psylab.
+#
+# Psylab is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Psylab is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Psylab.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Bug reports, bug fixes, suggestions, enhancements, or other
+# contributions are welcome. Go to https://github.com/cbrown1/psylab/
+# for more information and to contribute. Or send an e-mail to:
+# cbrown1@pitt.edu.
+#
+
+import math
+import functools
+import fractions
+import numpy as np
+import scipy.signal
+
+# Filter half-length (in multiples of max(up, down)) and kaiser beta
+_QUALITY = {
+    'low': (4, 5.0),
+    'medium': (10, 5.0),
+    'high': (32, 9.0),
+}
+
+
+def resample(sig, up, down, axis=0, quality='medium'):
+    '''Resamples a signal by the rational factor up / down
+
+        Uses polyphase filtering (scipy.signal.resample_poly). The
+        anti-aliasing filter is designed once for each up, down, quality
+        combination and reused on later calls. float32 input gives
+        float32 output.
+
+        Parameters
+        ----------
+        sig : array
+            The input signal.
+        up : int
+            The upsampling factor.
+        down : int
+            The downsampling factor.
+        axis : int
+            The axis along which to resample. Default = 0
+        quality : str
+            The length of the filter: 'low', 'medium' (the default, which
+            is the same as scipy's), or 'high'.
+
+        Returns
+        -------
+        y : array
+            The resampled signal, with ceil(n * up / down) samples along
+            axis, where n is the number of input samples.
+
+        Example
+        -------
+        # 44.1 to 48 kHz (the ratio is reduced to 160 / 147)
+        >>> y = psylab.signal.resample(sig, 48000, 44100)
+    '''
+    up, down = _reduce(up, down)
+    sig = np.asarray(sig)
+    if up == down == 1:
+        return np.array(sig, copy=True)
+    dtype = np.float32 if sig.dtype == np.float32 else np.float64
+    h = _design(up, down, quality).astype(dtype)
+    return scipy.signal.resample_poly(sig, up, down, axis=axis, window=h)
+
+
+class resampler(object):
+    '''Resamples a signal by the rational factor up / down, block by block
+
+        The filter state is carried from one block to the next, so that
+        the concatenated output of process followed by flush is the same
+        as that of resample on the whole signal. Output samples are
+        returned as soon as all of the input they depend on is available,
+        which is a latency of about 10 * max(up, down) / up input samples
+        (at medium quality).
+
+        Parameters
+        ----------
+        up : int
+            The upsampling factor.
+        down : int
+            The downsampling factor.
+        quality : str
+            The length of the filter: 'low', 'medium', or 'high'.
+
+        Example
+        -------
+        >>> r = psylab.signal.resampler(3, 2)
+        >>> y = np.concatenate([r.process(block) for block in blocks] + [r.flush()])
+    '''
+    def __init__(self, up, down, quality='medium'):
+        self.up, self.down = _reduce(up, down)
+        h = _design(self.up, self.down, quality) * self.up
+        self.half_len = (h.size - 1) // 2
+        self.taps = -(-h.size // self.up) + 1
+        h = np.concatenate((h, np.zeros(self.taps * self.up - h.size)))
+        # Row p holds the taps applied to the inputs i_hi, i_hi-1, ... for
+        # an output at upsampled position i_hi * up + p
+        self.poly = h.reshape(self.taps, self.up).T.copy()
+        self.reset()
+
+    def reset(self):
+        '''Clears the filter state
+        '''
+        self.x = None
+        self.i0 = -self.taps
+        self.n_in = 0
+        self.k = 0
+
+    def process(self, sig):
+        '''Adds a block of input and returns the completed output
+
+            Parameters
+            ----------
+            sig : array
+                The next block of the input signal. Samples are along
+                axis 0, and any other axes (eg., channels) are kept.
+
+            Returns
+            -------
+            y : array
+                The output completed so far.
+        '''
+        sig = np.asarray(sig)
+        if self.x is None:
+            dtype = np.float32 if sig.dtype == np.float32 else np.float64
+            self.x = np.zeros((self.taps,) + sig.shape[1:], dtype=dtype)
+            self.h = self.poly.astype(dtype)
+        self.x = np.concatenate((self.x, sig))
+        self.n_in += sig.shape[0]
+        if self.up == self.down == 1:
+            out = self.x[self.taps:].copy()
+            self.x = self.x[:self.taps]
+            self.k += out.shape[0]
+            return out
+        k_end = (self.n_in * self.up - 1 - self.half_len) // self.down + 1
+        out = self._render(self.k, max(k_end, self.k))
+        return out
+
+    def flush(self):
+        '''Completes the output once all of the input has been passed
+
+            Returns
+            -------
+            y : array
+                The remaining output, so that the total is
+                ceil(n * up / down) samples.
+        '''
+        if self.x is None:
+            return np.zeros(0)
+        n_out = -(-self.n_in * self.up // self.down)
+        if self.k >= n_out:
+            return self.x[:0].copy()
+        i_hi = ((n_out - 1) * self.down + self.half_len) // self.up
+        pad = max(i_hi + 1 - self.n_in, 0)
+        n_in = self.n_in
+        out = self.process(np.zeros((pad,) + self.x.shape[1:], dtype=self.x.dtype))
+        self.n_in = n_in
+        return out[:max(out.shape[0] - (self.k - n_out), 0)]
+
+    def _render(self, k, k_end, chunk=4096):
+        out = np.empty((k_end - k,) + self.x.shape[1:], dtype=self.x.dtype)
+        t = np.arange(self.taps)
+        for k0 in range(k, k_end, chunk):
+            ks = np.arange(k0, min(k0 + chunk, k_end))
+            n = ks * self.down + self.half_len
+            idx = (n // self.up)[:, np.newaxis] - t - self.i0
+            h = self.h[n % self.up]
+            out[k0 - k:k0 - k + ks.size] = np.einsum('kt,kt...->k...', h, self.x[idx])
+        self.k = k_end
+        # Keep only the input that later outputs still depend on
+        first = (self.k * self.down + self.half_len) // self.up - self.taps + 1
+        if first > self.i0:
+            self.x = self.x[first - self.i0:]
+            self.i0 = first
+        return out
+
+
+def _reduce(up, down):
+    up = int(up)
+    down = int(down)
+    if up < 1 or down < 1:
+        raise ValueError("`up` and `down` must be >= 1")
+    g = math.gcd(up, down)
+    return up // g, down // g
+
+
+def _ratio(ratio, max_denominator=100):
+    '''Returns up, down such that up / down approximates ratio
+    '''
+    f = fractions.Fraction(float(ratio)).limit_denominator(max_denominator)
+    return max(f.numerator, 1), f.denominator
+
+
+@functools.lru_cache(maxsize=32)
+def _design(up, down, quality='medium'):
+    '''Returns the anti-aliasing filter for up, down, at a quality
+    '''
+    if not quality in _QUALITY:
+        raise ValueError("`quality` must be 'low', 'medium', or 'high'")
+    half_len, beta = _QUALITY[quality]
+    max_rate = max(up, down)
+    h = scipy.signal.firwin(2 * half_len * max_rate + 1, 1. / max_rate, window=('kaiser', beta))
+    h.flags.writeable = False
+    return h
@@ -24,8 +24,13 @@
 #
 
 import numpy as np
+import scipy.signal
+from .window import _windows
 
-def smooth(x, wsize=10, wtype='hanning'):
+# Shaped windows at least this long are convolved with FFTs
+_FFT_WSIZE = 128
+
+def smooth(x, wsize=10, wtype='hanning', axis=0):
     '''Smooths a signal using windowing
         
        Smooths the input signal using a window with specified size and type.
@@ -48,6 +53,8 @@ def smooth(x, wsize=10, wtype='hanning'):
             'hamming'
             'bartlett'
             'blackman'
+       axis : int
+          The axis along which to smooth [default = 0]
         
         Returns
         -------
@@ -65,6 +72,12 @@ def smooth(x, wsize=10, wtype='hanning'):
        source:
        http://www.scipy.org/Cookbook/SignalSmooth
     
+       The flat window is computed as a running mean from a cumulative 
+       sum, and the others by direct convolution for small windows or by 
+       overlap-add FFT convolution for large ones, so that the time taken 
+       does not grow with the window size. To smooth a signal block by 
+       block, use smoother.
+
        see also: 
        
        numpy.hanning, numpy.hamming, numpy.bartlett, numpy.blackman, numpy.convolve
@@ -72,24 +85,137 @@ def smooth(x, wsize=10, wtype='hanning'):
  
        TODO: the window parameter could be the window itself if an array instead of a string.
     '''
-    if x.ndim != 1:
-        raise ValueError("smooth only accepts 1 dimension arrays.")
+    x = np.moveaxis(np.asarray(x), axis, 0)
 
-    if x.size < wsize:
+    if x.shape[0] < wsize:
         raise ValueError("Input vector needs to be bigger than window size.")
 
     if wsize<3:
-        return x
+        return np.moveaxis(x, 0, axis)
 
-    if not wtype in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
+    if not wtype in _windows:
         raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
 
-    s=np.r_[2*x[0]-x[wsize:1:-1],x,2*x[-1]-x[-1:-wsize:-1]]
-    #print(len(s))
-    if wtype == 'flat': #moving average
-        w=np.ones(wsize,'d')
-    else:
-        w=eval('np.'+wtype+'(wsize)')
+    s=np.concatenate((2*x[0]-x[wsize:1:-1],x,2*x[-1]-x[-1:-wsize:-1]))
+    y = _convolve_valid(s, wsize, wtype)
+    n = s.shape[0] - 2*(wsize-1)
+    return np.moveaxis(y[(wsize-1)//2:(wsize-1)//2+n], 0, axis)
+
+
+class smoother:
+    '''Smooths a signal block by block
+
+       The output is the same as that of smooth on the whole signal, 
+       delayed by about wsize samples. The signal is reflected at the 
+       start (once wsize+1 samples have been passed) and at the end (on 
+       flush), as in smooth.
+
+       Parameters
+       ----------
+       wsize : scalar
+          The width of the smoothing window
+       wtype : string
+          The type of window (see smooth)
 
-    y = np.convolve(w/w.sum(),s,mode='same')
-    return y[wsize-1:-wsize+1]
+       Example
+       -------
+       >>> s = psylab.signal.smoother(400, 'flat')
+       >>> y = np.concatenate([s.process(block) for block in blocks] + [s.flush()])
+    '''
+    def __init__(self, wsize=10, wtype='hanning'):
+        if not wtype in _windows:
+            raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+        self.wsize = int(wsize)
+        self.wtype = wtype
+        self.reset()
+
+    def reset(self):
+        '''Clears the buffers
+        '''
+        self.x = None       # Input, until the start can be reflected
+        self.s = None       # The last wsize-1 samples of the reflected signal
+        self.last = None    # The last wsize samples of the input
+        self.skip = 0
+        self.n_in = 0
+        self.n_out = 0
+
+    def process(self, sig):
+        '''Adds a block of input and returns the completed output
+
+            Parameters
+            ----------
+            sig : array
+                The next block of the signal. Samples are along axis 0.
+
+            Returns
+            -------
+            y : array
+                The output completed so far.
+        '''
+        sig = np.asarray(sig)
+        self.n_in += sig.shape[0]
+        w = self.wsize
+        if self.s is None:
+            self.x = sig if self.x is None else np.concatenate((self.x, sig))
+            if w < 3 or self.x.shape[0] <= w:
+                return self._out(self.x[:0])
+            sig = self.x
+            self.x = None
+            self.s = 2*sig[0]-sig[w:1:-1]
+            self.last = sig[:0]
+            self.skip = (w-1)//2
+        self.last = np.concatenate((self.last, sig))[-w:]
+        return self._add(sig)
+
+    def flush(self):
+        '''Completes the output once all of the input has been passed
+
+            Returns
+            -------
+            y : array
+                The remaining output.
+        '''
+        if self.s is None:
+            if self.x is None:
+                return np.zeros(0)
+            y = smooth(self.x, self.wsize, self.wtype)[self.n_out:]
+            self.x = None
+            return self._out(y)
+        n = max(self.n_in - self.n_out, 0)
+        y = self._add(2*self.last[-1]-self.last[-1:-self.wsize:-1])[:n]
+        self.n_out = self.n_in
+        return y
+
+    def _add(self, sig):
+        s = np.concatenate((self.s, sig))
+        self.s = s[s.shape[0]-(self.wsize-1):]
+        if s.shape[0] < self.wsize:
+            return self._out(s[:0])
+        y = _convolve_valid(s, self.wsize, self.wtype)
+        n = min(self.skip, y.shape[0])
+        self.skip -= n
+        return self._out(y[n:])
+
+    def _out(self, y):
+        self.n_out += y.shape[0]
+        return y
+
+
+def _convolve_valid(s, wsize, wtype):
+    '''Returns the valid part of s convolved with a normalized window, along axis 0
+    '''
+    if wtype == 'flat':
+        cs = np.zeros((s.shape[0]+1,) + s.shape[1:], dtype=np.result_type(s.dtype, np.float64))
+        np.cumsum(s, axis=0, out=cs[1:])
+        y = cs[wsize:] - cs[:-wsize]
+        y /= wsize
+        return y
+    w = _windows[wtype](wsize)
+    w = w/w.sum()
+    if wsize < _FFT_WSIZE:
+        s2 = s.reshape((s.shape[0], -1))
+        y = np.empty((s.shape[0]-wsize+1, s2.shape[1]), dtype=np.result_type(s.dtype, w.dtype))
+        for i in range(s2.shape[1]):
+            y[:, i] = np.convolve(s2[:, i], w, mode='valid')
+        return y.reshape((y.shape[0],) + s.shape[1:])
+    return scipy.signal.oaconvolve(s, w.reshape((wsize,) + (1,)*(s.ndim-1)), mode='valid', axes=0)
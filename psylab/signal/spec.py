@@ -23,90 +23,515 @@
 # cbrown1@pitt.edu.
 #
 
+import os
 import numpy as np
+import scipy.fft
+from scipy.io.wavfile import read as wavread
 from matplotlib import colors, pyplot as pp
+from .window import sliding_window, _windows
 
 
-def lts(sig, wsize, overlap=0, window=None):
+def lts(sig, wsize, overlap=0, window=None, axis=0, chunksize=None):
     """Computes a long-term spectrum of a signal
     
         lts computes a long-term spectrum of a signal by breaking it up
         into a number of chunks of size wsize, applying a window, and then
-        averaging the fft of each windowed chunk. Recall that the fft function 
-        will simply truncate the signal if you set the fftsize to be less 
-        than the length of the signal. 
+        averaging the magnitude of the fft of each windowed chunk. The 
+        remaining samples at the end of the signal are windowed and zero-
+        padded to make a final chunk. 
+
+        The chunks are taken as strided views of the signal, and are 
+        transformed chunksize at a time in a single batched fft, so that 
+        memory use is bounded even for very long (or memory-mapped) signals.
        
        Parameters
        ----------
        sig : array
-          The input signal
+          The input signal. If it is more than 1-d, a spectrum is 
+          computed for each channel.
        wsize : scalar
           The width of the window. Should be a power of 2
-       wtype : string
+       overlap : scalar
+          The number of samples to overlap each window [default = 0]
+       window : string
           The type of window:
             'flat' [no window]
             'hanning' [default]
             'hamming'
             'bartlett'
             'blackman'
-        overlap : scalar
-          The number of samples to overlap each window [default = 0]
+       axis : int
+          The axis along which to compute the spectrum [default = 0]
+       chunksize : int
+          The number of windows to transform at once. The default keeps 
+          each batch to about 2**20 samples.
         
         Returns
         -------
         y : array
-            The averaged fft of the signal. The length will be wsize/2.
+            The averaged magnitude spectrum of the signal. It has 
+            wsize//2+1 points along axis.
             
     """
-    
-    siglen = len(sig)    
-    pt = 0
-    newpt = pt + wsize
-    n = 0
-    ltfft = np.zeros(wsize/2+1)
-
-    if window == None:
+    if window is None:
         window = 'hanning'
-    if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
+    if not window in _windows:
         raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
-    
-    if window == 'flat': #no window
-        w=np.ones(wsize,'d')
-    else:
-        w=eval('np.%s(%i)' % (window, wsize))
-    
-    while siglen > newpt:
-        thissig = sig[pt:newpt] * w
-        ltfft += np.real(np.fft.rfft(thissig))
-        pt = newpt + 1 - overlap
-        newpt = pt + wsize
-        n += 1
-    if window == 'flat': #no window
-        w=np.ones(siglen-pt,'d')
+    wsize = int(wsize)
+    hop = wsize - int(overlap)
+    if hop < 1:
+        raise ValueError("`overlap` must be less than `wsize`")
+
+    x = np.moveaxis(np.asarray(sig), axis, 0)
+    shape = x.shape[1:]
+    x = x.reshape((x.shape[0], -1))
+    siglen, nch = x.shape
+    if chunksize is None:
+        chunksize = max(2**20 // (wsize * nch), 1)
+
+    ltfft = np.zeros((wsize//2+1, nch))
+    n = _lts_frames(x, wsize, hop, _windows[window](wsize), chunksize, ltfft)
+    pt = n * hop
+    w = _windows[window](siglen - pt)[:, np.newaxis]
+    ltfft += np.abs(scipy.fft.rfft(x[pt:] * w, wsize, axis=0))
+    ltfft /= n + 1
+    return np.moveaxis(ltfft.reshape((wsize//2+1,) + shape), 0, axis)
+
+
+def _lts_frames(x, wsize, hop, w, chunksize, out):
+    """Adds the magnitude spectra of the full windows of x to out
+
+        x is (samples, channels), and the windows used are those that end 
+        before the last sample. Returns the number of windows.
+    """
+    nch = x.shape[1]
+    n = max(x.shape[0] - 1 - wsize, -1) // hop + 1
+    if n > 0:
+        frames = sliding_window(x[:(n - 1) * hop + wsize], (wsize, nch), (hop, nch), flatten=False)[:, 0]
+        chunksize = min(chunksize, n)
+        buf = np.empty((chunksize, wsize, nch))
+        mag = np.empty((chunksize, wsize//2+1, nch))
+        w = w[:, np.newaxis]
+        for i in range(0, n, chunksize):
+            m = min(chunksize, n - i)
+            np.multiply(frames[i:i+m], w, out=buf[:m])
+            np.abs(scipy.fft.rfft(buf[:m], axis=1, overwrite_x=True), out=mag[:m])
+            out += mag[:m].sum(axis=0)
+    return n
+
+
+class lts_accumulator:
+    """Accumulates a long-term spectrum over many signals, or blocks of a signal
+
+        Each signal is windowed as in lts, and the magnitude spectra of all 
+        of the windows are summed, so that the spectrum of a whole corpus 
+        can be built up one file at a time without keeping it in memory. 
+        Accumulators with the same parameters can be merged, as when the 
+        files are divided up among several processes. Merging gives the 
+        same spectrum (up to rounding) as accumulating all of the files 
+        in one.
+
+        Parameters
+        ----------
+        wsize : scalar
+            The width of the window. Should be a power of 2
+        overlap : scalar
+            The number of samples to overlap each window [default = 0]
+        window : string
+            The type of window (see lts) [default = 'hanning']
+
+        Example
+        -------
+        >>> acc = lts_accumulator(8192)
+        >>> for f in files:
+        ...     acc.add_file(f)
+        >>> spec = acc.get_spectrum()
+    """
+    def __init__(self, wsize, overlap=0, window=None):
+        if window is None:
+            window = 'hanning'
+        if not window in _windows:
+            raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+        self.wsize = int(wsize)
+        self.overlap = int(overlap)
+        self.window = window
+        if self.wsize - self.overlap < 1:
+            raise ValueError("`overlap` must be less than `wsize`")
+        self.w = _windows[window](self.wsize)
+        self.reset()
+
+    def reset(self):
+        """Clears the accumulated spectrum
+        """
+        self.sum = None
+        self.n = 0
+        self.fs = None
+        self.shape = None
+        self.x = None
+
+    def process(self, sig):
+        """Adds the next block of a signal
+
+            Windows may span blocks. Call flush once the signal is complete.
+
+            Parameters
+            ----------
+            sig : array
+                The next block of the signal. Samples are along axis 0, and 
+                channels along any other axes.
+        """
+        sig = np.asarray(sig)
+        if self.shape is None:
+            self.shape = sig.shape[1:]
+            self.sum = np.zeros((self.wsize//2+1, int(np.prod(self.shape))))
+        x = sig.reshape((sig.shape[0], -1))
+        if self.x is not None:
+            x = np.concatenate((self.x, x))
+        hop = self.wsize - self.overlap
+        n = _lts_frames(x, self.wsize, hop, self.w, max(2**20 // (self.wsize * x.shape[1]), 1), self.sum)
+        self.n += n
+        self.x = x[n * hop:].copy()
+
+    def flush(self):
+        """Completes the current signal
+
+            The remaining samples are windowed and zero-padded to make a 
+            final window, as in lts.
+        """
+        if self.x is not None and self.x.shape[0] > 0:
+            w = _windows[self.window](self.x.shape[0])[:, np.newaxis]
+            self.sum += np.abs(scipy.fft.rfft(self.x * w, self.wsize, axis=0))
+            self.n += 1
+        self.x = None
+
+    def add(self, sig):
+        """Adds a whole signal
+        """
+        self.process(sig)
+        self.flush()
+
+    def add_file(self, filename):
+        """Adds a wav file
+
+            Integer samples are scaled to +/-1. All files must have the same 
+            sampling rate.
+        """
+        fs, data = wavread(filename)
+        if self.fs is None:
+            self.fs = fs
+        elif fs != self.fs:
+            raise ValueError("{} has a sampling rate of {}, not {}".format(filename, fs, self.fs))
+        if np.issubdtype(data.dtype, np.integer):
+            data = data / float(np.iinfo(data.dtype).max + 1)
+        self.add(data)
+
+    def merge(self, other):
+        """Adds the spectra accumulated by another lts_accumulator
+
+            Both must have the same parameters and no signals in progress 
+            (see flush). Returns self.
+        """
+        if (self.wsize, self.overlap, self.window) != (other.wsize, other.overlap, other.window):
+            raise ValueError("Only accumulators with the same wsize, overlap and window can be merged")
+        if self.x is not None or other.x is not None:
+            raise ValueError("Flush both accumulators before merging")
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.sum = other.sum.copy()
+            self.shape = other.shape
+        elif self.shape != other.shape:
+            raise ValueError("Accumulators have different numbers of channels")
+        else:
+            self.sum += other.sum
+        if self.fs is None:
+            self.fs = other.fs
+        elif other.fs is not None and other.fs != self.fs:
+            raise ValueError("Accumulators have different sampling rates")
+        self.n += other.n
+        return self
+
+    def get_spectrum(self):
+        """Returns the long-term spectrum so far, with wsize//2+1 points
+        """
+        if self.n == 0:
+            raise ValueError("No signals have been added")
+        return (self.sum / self.n).reshape((self.wsize//2+1,) + self.shape)
+
+
+def ltass(files, wsize, overlap=0, window=None, workers=None):
+    """Computes the long-term average spectrum of a corpus of wav files
+
+        The spectrum is averaged over the windows of all files, with each 
+        file windowed as in lts. The files can be divided among several 
+        processes, the accumulated spectra of which are then merged.
+
+        Parameters
+        ----------
+        files : list, string, or consecutive_files
+            The files to use. Either a list of filenames, a folder (all 
+            .wav files in it are used), or a psylab.folder.consecutive_files 
+            object.
+        wsize : scalar
+            The width of the window. Should be a power of 2
+        overlap : scalar
+            The number of samples to overlap each window [default = 0]
+        window : string
+            The type of window (see lts) [default = 'hanning']
+        workers : int
+            The number of processes to use. Default = None (1)
+
+        Returns
+        -------
+        y : array
+            The long-term average magnitude spectrum, with wsize//2+1 points.
+    """
+    if hasattr(files, 'file_list'):
+        files = [os.path.join(files.path, f) for f in files.file_list]
+    elif isinstance(files, str):
+        files = [os.path.join(files, f) for f in sorted(os.listdir(files)) 
+                 if os.path.splitext(f)[1].lower() == '.wav']
+    args = (wsize, overlap, window)
+    if workers is not None and workers > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        groups = np.array_split(np.arange(len(files)), min(workers, len(files)))
+        with ProcessPoolExecutor(len(groups)) as pool:
+            parts = list(pool.map(_ltass_worker, [args + ([files[i] for i in g],) for g in groups]))
+        acc = parts[0]
+        for part in parts[1:]:
+            acc.merge(part)
     else:
-        w=eval('np.%s(%i)' % (window, siglen-pt))
-    
-    ltfft += np.real(np.fft.rfft(sig[pt:]*w,wsize))
-    return np.abs(ltfft / (n+1))
+        acc = _ltass_worker(args + (files,))
+    return acc.get_spectrum()
+
+
+def _ltass_worker(args):
+    wsize, overlap, window, files = args
+    acc = lts_accumulator(wsize, overlap, window)
+    for f in files:
+        acc.add_file(f)
+    return acc
 
 
-def magspec(wave,fs,fftsize=8192):
+def magspec(wave, fs, fftsize=8192, axis=0):
     '''Computes the magnitude spectrum of a signal
     
-        Performs an fft on the input, and passes back an array of frequency 
-        values, and an array of magnitude values, suitable for plotting. The 
-        magnitude spectrum is in dB (20*log10).
+        Computes the long-term spectrum of the input (see lts), and passes 
+        back an array of frequency values, and an array of magnitude values, 
+        suitable for plotting. The magnitude spectrum is in dB (20*log10).
     '''
-    #amp=np.abs(np.fft.fft(wave,fftsize));
-    #fsize = np.round(len(amp)/2.)-1;
-    #outamp= amp[0:np.round(len(amp)/2)-1];
-    
-    outamp = 20*np.log10(lts(wave, fftsize))
-    #outamp=20*log10(outamp/max(outamp));
-    f = np.linspace(1, fs/2, (fftsize/2)+1)
+    outamp = 20*np.log10(lts(wave, fftsize, axis=axis))
+    f = np.linspace(1, fs/2., fftsize//2+1)
     return f,outamp
 
 
+class spectrogram:
+    '''A spectrogram, computed once, for fast plotting and browsing
+
+        The short-time fourier transform of the signal is computed in 
+        chunks and stored as float32 magnitudes in dB, at a hop of at least 
+        nfft/2. A pyramid of versions decimated in time (by taking the max 
+        of each pair of windows, so that brief events remain visible) is 
+        also kept, so that plots of any portion of the signal are drawn 
+        from no more windows than there are pixels. Plots made with the 
+        plot method are redrawn from the cache when zoomed or panned. When 
+        zoomed in far enough that the cache has fewer windows than there 
+        are pixels, the visible portion is recomputed from the signal, at a 
+        hop as small as nfft - overlap.
+
+        The cache takes about 2 * 4 * samples * (nfft/2+1) / hop bytes, 
+        where hop is the larger of nfft - overlap and nfft/2. That is about 
+        8 bytes per sample at the default hop of nfft/2 (eg., 640 MB for 30 
+        minutes at 44.1 kHz), with half of it in the full resolution level.
+
+        Parameters
+        ----------
+        sig : array
+            The 1-d input signal. A reference is kept, for zooming.
+        fs : scalar
+            The sampling frequency
+        nfft : int
+            The width of each window, in samples [default = 1024]
+        overlap : int
+            The largest number of samples to overlap each window, when 
+            zoomed in [default = nfft/2]
+        window : string
+            The type of window (see lts) [default = 'hanning']
+        chunksize : int
+            The number of windows to transform at once. The default keeps 
+            each batch to about 2**20 samples.
+
+        Example
+        -------
+        >>> s = psylab.signal.spectrogram(sig, fs)
+        >>> s.plot()                      # Zoom and pan as needed
+        >>> f, y = s.magspec(1.5, 2.5)    # Spectrum from 1.5 to 2.5 s
+    '''
+    def __init__(self, sig, fs, nfft=1024, overlap=None, window=None, chunksize=None):
+        if window is None:
+            window = 'hanning'
+        if not window in _windows:
+            raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+        sig = np.asarray(sig)
+        if sig.ndim != 1:
+            raise ValueError("`sig` must be 1-d")
+        self.fs = fs
+        self.nfft = int(nfft)
+        if overlap is None:
+            overlap = self.nfft // 2
+        self.hop = self.nfft - int(overlap)
+        if self.hop < 1:
+            raise ValueError("`overlap` must be less than `nfft`")
+        self.cache_hop = max(self.hop, self.nfft // 2, 1)
+        if sig.size < self.nfft:
+            sig = np.concatenate((sig, np.zeros(self.nfft - sig.size, dtype=sig.dtype)))
+        self.sig = sig
+        self.duration = sig.size / float(fs)
+        self.chunksize = max(2**20 // self.nfft, 1) if chunksize is None else chunksize
+        self.window = window
+        self.w = _windows[window](self.nfft).astype(np.float32)
+
+        data = self._levels(0, sig.size, self.cache_hop)
+        self.levels = [data]
+        while self.levels[-1].shape[0] > 1:
+            d = self.levels[-1]
+            if d.shape[0] % 2:
+                d = np.concatenate((d, d[-1:]))
+            self.levels.append(np.maximum(d[0::2], d[1::2]))
+        # The samples after the windows that end before the last sample, 
+        # windowed and zero-padded, as in lts
+        self.n_lts = max(sig.size - 1 - self.nfft, -1) // self.cache_hop + 1
+        pt = self.n_lts * self.cache_hop
+        self.tail = np.abs(scipy.fft.rfft(sig[pt:] * _windows[window](sig.size - pt), self.nfft))
+        self.f = np.fft.rfftfreq(self.nfft, 1. / fs)
+
+    def _levels(self, start, stop, hop):
+        '''Returns the levels in dB of the windows of sig[start:stop], at hop
+        '''
+        frames = sliding_window(self.sig[start:stop], self.nfft, hop, flatten=False)
+        n = frames.shape[0]
+        data = np.empty((n, self.nfft//2+1), dtype=np.float32)
+        tiny = np.finfo(np.float32).tiny
+        for i in range(0, n, self.chunksize):
+            mag = np.abs(scipy.fft.rfft(frames[i:i+self.chunksize].astype(np.float32) * self.w, axis=1))
+            np.log10(np.maximum(mag, tiny, out=mag), out=mag)
+            np.multiply(mag, 20, out=data[i:i+self.chunksize])
+        return data
+
+    def get_data(self, t0=None, t1=None, width=None):
+        '''Returns the spectrogram between two times, decimated to a width
+
+            Parameters
+            ----------
+            t0, t1 : scalar
+                The start and end times, in s. Default = the whole signal
+            width : int
+                The maximum number of windows to return, eg., the width of 
+                the plot in pixels. Default = no decimation. If the cache 
+                has fewer windows than width between t0 and t1, the windows 
+                are recomputed at a smaller hop (no smaller than 
+                nfft - overlap), to give about width windows.
+
+            Returns
+            -------
+            data : array
+                The magnitudes in dB, (windows by frequencies).
+            extent : tuple
+                The start and end times of the returned windows, in s.
+        '''
+        t0 = 0. if t0 is None else max(t0, 0.)
+        t1 = self.duration if t1 is None else min(t1, self.duration)
+        n = self.levels[0].shape[0]
+        k0 = min(max(int(np.floor(t0 * self.fs / self.cache_hop)), 0), n - 1)
+        k1 = min(max(int(np.ceil(t1 * self.fs / self.cache_hop)), k0 + 1), n)
+        if width is not None and k1 - k0 < width and self.hop < self.cache_hop:
+            hop = max(self.hop, int(np.ceil((t1 - t0) * self.fs / width)))
+            if hop < self.cache_hop:
+                nmax = (self.sig.size - self.nfft) // hop + 1
+                j0 = min(max(int(np.floor(t0 * self.fs / hop)), 0), nmax - 1)
+                j1 = min(max(int(np.ceil(t1 * self.fs / hop)), j0 + 1), nmax)
+                data = self._levels(j0 * hop, (j1 - 1) * hop + self.nfft, hop)
+                return data, (j0 * hop / float(self.fs), j1 * hop / float(self.fs))
+        level = 0
+        if width is not None:
+            while level < len(self.levels) - 1 and (k1 - k0) >> level > width:
+                level += 1
+        step = 2**level
+        j0 = k0 // step
+        j1 = max(-(-k1 // step), j0 + 1)
+        data = self.levels[level][j0:j1]
+        extent = (j0 * step * self.cache_hop / float(self.fs), 
+                  min(j1 * step * self.cache_hop, n * self.cache_hop) / float(self.fs))
+        return data, extent
+
+    def magspec(self, t0=None, t1=None):
+        '''Returns the magnitude spectrum between two times
+
+            The magnitudes of the cached windows are averaged, as with lts. 
+            If t1 is the end of the signal, the remaining samples after the 
+            last window are windowed and zero-padded into a final window, 
+            also as with lts, so that magspec() is the same as lts(sig, 
+            nfft, nfft - hop, window), where hop is the hop of the cache.
+
+            Returns
+            -------
+            f : array
+                The frequencies, in Hz.
+            y : array
+                The magnitudes, in dB.
+        '''
+        data, extent = self.get_data(t0, t1)
+        end = t1 is None or t1 >= self.duration
+        if end:
+            # The last cached window may be part of the final lts window
+            data = data[:data.shape[0] - (self.levels[0].shape[0] - self.n_lts)]
+        mag = np.power(10., data / 20.).sum(axis=0)
+        n = data.shape[0]
+        if end:
+            mag += self.tail
+            n += 1
+        return self.f, 20 * np.log10(mag / n)
+
+    def plot(self, ax=None, cmap=None, **kwargs):
+        '''Plots the spectrogram, redrawing from the cache on zoom and pan
+
+            Extra keyword arguments are passed to imshow.
+
+            Returns
+            -------
+            im : AxesImage
+                The image.
+        '''
+        if ax is None:
+            ax = pp.gca()
+        if cmap is None:
+            cmap = _specgram_cmap()
+        data, extent = self.get_data(width=self._width(ax))
+        im = ax.imshow(data.T, origin='lower', aspect='auto', cmap=cmap, 
+                       extent=(extent[0], extent[1], 0, self.fs / 2.), **kwargs)
+        ax.set_xlim(0, self.duration)
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Frequency (Hz)')
+
+        def update(ax):
+            t0, t1 = ax.get_xlim()
+            data, extent = self.get_data(t0, t1, self._width(ax))
+            im.set_data(data.T)
+            im.set_extent((extent[0], extent[1], 0, self.fs / 2.))
+        ax.callbacks.connect('xlim_changed', update)
+        return im
+
+    def _width(self, ax):
+        return max(int(ax.get_window_extent().width), 1)
+
+
+def _specgram_cmap():
+    cdict = {'red': ((0.0, 0.0, 0.0), (0.5, 0.2, 0.2), (0.78, 0.6, 0.6), (1.0, 1.0, 1.0)), 
+    'green': ((0.0, 0.0, 0.0), (0.93, 0.0, 0.0), (1.0, 0.9, 0.9)), 
+    'blue': ((0.0, 0.0, 0.0), (1.0, 0.0, 0.0))}
+    return colors.LinearSegmentedColormap('my_colormap',cdict,256)
+
+
 def specplot(signal, fs, plotspec='b-',log=False, fighandle=None):
     '''Plots magnitude spectra
         
@@ -116,8 +541,9 @@ def specplot(signal, fs, plotspec='b-',log=False, fighandle=None):
         
        Parameters
        ----------
-       signal : array
-          The input signal.
+       signal : array or spectrogram
+          The input signal. If it is a spectrogram, its cached magnitude 
+          spectrum is plotted.
        fs : scalar
           The sampling frequency
        plotspec : string
@@ -136,32 +562,45 @@ def specplot(signal, fs, plotspec='b-',log=False, fighandle=None):
       pp.figure(fighandle).get_axes()[0].set_autoscale_on(False)
 
     h = pp.figure(num=fighandle)
-    h.canvas.set_window_title('Spectrum Plot')
-    x,y = magspec(signal,fs)
+    if h.canvas.manager is not None:
+      h.canvas.manager.set_window_title('Spectrum Plot')
+    if isinstance(signal, spectrogram):
+      x,y = signal.magspec()
+    else:
+      x,y = magspec(signal,fs)
+    ax = h.gca()
     if log:
-      pp.semilogx(x,y,plotspec,figure=fighandle)
+      ax.semilogx(x,y,plotspec)
     else:
-      pp.plot(x,y,plotspec,figure=fighandle)
-    pp.xlabel('Frequency (Hz)')
-    pp.ylabel('Magnitude (dB)')
+      ax.plot(x,y,plotspec)
+    ax.set_xlabel('Frequency (Hz)')
+    ax.set_ylabel('Magnitude (dB)')
     pp.show()
 
 
-def specgram(signal, fs):
+def specgram(signal, fs, nfft=1024, overlap=1000):
     '''Plots a nice spectrogram
   
        Parameters
        ----------
-       signal : array
-          The input signal.
+       signal : array or spectrogram
+          The input signal. If it is a spectrogram, it is plotted from its 
+          cache.
        fs : scalar
           The sampling frequency
-    '''
-
-    cdict = {'red': ((0.0, 0.0, 0.0), (0.5, 0.2, 0.2), (0.78, 0.6, 0.6), (1.0, 1.0, 1.0)), 
-    'green': ((0.0, 0.0, 0.0), (0.93, 0.0, 0.0), (1.0, 0.9, 0.9)), 
-    'blue': ((0.0, 0.0, 0.0), (1.0, 0.0, 0.0))}
-    my_cmap = colors.LinearSegmentedColormap('my_colormap',cdict,256)
-    s1 = pp.specgram(signal,Fs=fs,NFFT=1024,noverlap=1000,cmap=my_cmap,scale_by_freq=False)
-
+       nfft : int
+          The width of each window, in samples [default = 1024]
+       overlap : int
+          The largest number of samples to overlap each window, when 
+          zoomed in [default = 1000]. The cache is built at a hop of 
+          nfft/2 (see spectrogram).
 
+       Returns
+       -------
+       s : spectrogram
+          The spectrogram, which can be plotted again without recomputing.
+    '''
+    if not isinstance(signal, spectrogram):
+        signal = spectrogram(signal, fs, nfft, overlap)
+    signal.plot()
+    return signal
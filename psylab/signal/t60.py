@@ -24,19 +24,41 @@
 #
 
 import numpy as np
-from scipy.stats import linregress
+import scipy.signal
+
+# Octave band center frequencies used by t60_bands
+_OCTAVES = np.array([125, 250, 500, 1000, 2000, 4000, 8000])
+
+# The size of the bands array that t60_bands filters into at once, in bytes
+_CHUNK_BYTES = 64 * 2**20
 
 def cumr2(x, y):
+    '''Returns the r2 of regressions of y on x, over the first 1, 2, ... n points
 
+        y can be 2-d, in which case the r2s for each column are returned.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
     last = len(x);
-    r2 = np.zeros(last);
-    sampsize = np.linspace(1,last,last);
-    Exy2 = (np.cumsum(x * y) - ((np.cumsum(x) * np.cumsum(y)) / sampsize))**2;
-    Ex2 = np.cumsum(x**2) - ((np.cumsum(x)**2) / sampsize);
-    totss = np.cumsum(y**2) - ((np.cumsum(y)**2) / sampsize);
-    regss = Exy2[1:] / Ex2[1:];
+    shape = (last,) + (1,) * (y.ndim - 1)
+    # Sums over x are 1-d, and the sums over y are done in place, so that 
+    # there are only three arrays the size of y
+    sampsize = np.linspace(1,last,last).reshape(shape);
+    sx = np.cumsum(x).reshape(shape)
+    Ex2 = np.cumsum(x**2).reshape(shape) - sx**2 / sampsize;
+    sy = np.cumsum(y, axis=0)
+    r2 = np.multiply(x.reshape(shape), y)
+    np.cumsum(r2, axis=0, out=r2)
+    r2 -= sx * sy / sampsize
+    r2 **= 2 # Exy2
+    totss = np.square(y)
+    np.cumsum(totss, axis=0, out=totss)
+    sy **= 2
+    sy /= sampsize
+    totss -= sy
+    r2[1:] /= Ex2[1:] # regss
+    r2[1:] /= totss[1:]
     r2[0] = np.nan;
-    r2[1:] = regss / totss[1:];
 
     return r2
 
@@ -83,18 +105,154 @@ def t60(data, fs, toplot=False):
         plot((0,-60),(0,intercept),'r-')
     '''
     
-    y = np.flipud( np.cumsum( np.flipud( data**2 ) ) ) ; # time-reverse, integrate, reverse again
-    y = 10 * np.log10( y / np.max( np.abs( y ) ) ); # Convert to dB
+    y = _schroeder(data)
     xtime = np.linspace( 0, ( len( y ) / ( fs / 1000. ) ), len( y ) ) ;
-    begin = np.round( fs * .05 ); # Assume slope extends to at least 50 ms (adjust as necessary
-    r2 = cumr2( xtime[ begin: ], y[ begin: ] ) ; # Get cumulative r2's
-    r2max = np.nonzero( r2[ 2: ] == np.max( r2[ 2: ] ) ) ; # Find all of the points along slope where r2 is max
-    stop = begin + 2 + r2max[ -1 ] ; # Use index of the max(r2) that is furthest down the slope
-    slope, intercept, r, prob, stderr = linregress( xtime[ begin:stop[ 0 ] ], y[ begin:stop[ 0 ] ] ) ;
-    rt = np.round( np.abs( 60. / slope ) - intercept ) ;
+    rt, slope, intercept = _t60(xtime, y, int(np.round(fs * .05))) # Assume slope extends to at least 50 ms
     if toplot:
         ret = rt, y, slope, intercept
     else:
         ret = rt, y
       
     return ret
+
+
+def t60_bands(irs, fs, cfs=None, order=3, workers=None):
+    '''Estimates reverberation times of many impulse responses in octave bands
+
+        Each impulse response is filtered into octave bands, and its 
+        integrated impulse decay curve (Schroeder, 1965) in each band is 
+        used to estimate T20 and T30 (the time to decay by 60 dB, 
+        extrapolated from the decay between -5 and -25, or -5 and -35 dB), 
+        and T60 (as returned by t60). All of the impulse responses are 
+        filtered, integrated, and fit at once.
+
+        Parameters
+        ----------
+        irs : ndarray
+            The impulse responses, with samples along axis 0, and one 
+            column per impulse response. Pass only the segment of each IR 
+            after the offset of the impulse
+        fs : scalar
+            The sampling frequency
+        cfs : array
+            The octave band center frequencies. Default is 125 to 8000 Hz, 
+            up to the highest band that fits below fs/2.
+        order : int
+            The order of the butterworth band-pass filters [default = 3]
+        workers : int
+            The number of processes over which to divide the impulse 
+            responses. Default = None (1)
+
+        Returns
+        -------
+        t20, t30, t60 : arrays
+            The reverberation time estimates, in ms, with one row per 
+            impulse response and one column per band (or one value per 
+            band, if irs is 1-d). Values are nan where the decay does not 
+            reach the needed level.
+
+        Example
+        -------
+        >>> t20, t30, t60 = t60_bands(irs, fs)
+    '''
+    irs = np.asarray(irs)
+    if cfs is None:
+        cfs = _OCTAVES[_OCTAVES * np.sqrt(2) < fs / 2.]
+    cfs = np.atleast_1d(cfs)
+    x = irs.reshape((irs.shape[0], -1))
+    if workers is not None and workers > 1 and x.shape[1] > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        groups = np.array_split(np.arange(x.shape[1]), min(workers, x.shape[1]))
+        with ProcessPoolExecutor(len(groups)) as pool:
+            parts = list(pool.map(_t60_bands_worker, [(x[:, g], fs, cfs, order) for g in groups]))
+        ret = [np.concatenate(p, axis=0) for p in zip(*parts)]
+    else:
+        ret = _t60_bands_worker((x, fs, cfs, order))
+    if irs.ndim == 1:
+        ret = [r[0] for r in ret]
+    return tuple(ret)
+
+
+def _t60_bands_worker(args):
+    x, fs, cfs, order = args
+    soss = [scipy.signal.butter(order, [cf / np.sqrt(2) / (fs / 2.), min(cf * np.sqrt(2) / (fs / 2.), 0.999)], 
+                                btype='band', output='sos') for cf in cfs]
+    # Filter and fit a few impulse responses at a time, to bound memory
+    step = max(_CHUNK_BYTES // (x.shape[0] * cfs.size * 8), 1)
+    parts = [_t60_bands_chunk(x[:, i:i+step], fs, soss) for i in range(0, x.shape[1], step)]
+    return tuple(np.concatenate(p, axis=0) for p in zip(*parts))
+
+
+def _t60_bands_chunk(x, fs, soss):
+    bands = np.empty(x.shape + (len(soss),))
+    for i, sos in enumerate(soss):
+        bands[:, :, i] = scipy.signal.sosfilt(sos, x, axis=0)
+    y = _schroeder(bands)
+    del bands
+    xtime = np.linspace( 0, ( len( y ) / ( fs / 1000. ) ), len( y ) )
+    t60 = _t60(xtime, y, int(np.round(fs * .05)))[0]
+    t20 = _t_range(xtime, y, -5, -25)
+    t30 = _t_range(xtime, y, -5, -35)
+    return t20, t30, t60
+
+
+def _schroeder(data):
+    '''Returns the integrated impulse decay curve(s) of data, in dB, along axis 0
+    '''
+    y = np.square(data[::-1])
+    np.cumsum(y, axis=0, out=y)
+    y = y[::-1] # time-reverse, integrate, reverse again
+    with np.errstate(divide='ignore'):
+        y /= np.max( np.abs( y ), axis=0 )
+        np.log10(y, out=y)
+    y *= 10 # Convert to dB
+    return y
+
+
+def _t60(xtime, y, begin):
+    '''Fits each decay curve from begin to where the cumulative r2 peaks
+
+        Returns rt, slope and intercept, as described in t60.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = cumr2( xtime[ begin: ], y[ begin: ] ) # Get cumulative r2's
+    r2 = np.where(np.isnan(r2[2:]), -np.inf, r2[2:])
+    stop = begin + 2 + np.argmax(r2, axis=0) # The first point along slope where r2 is max
+    slope, intercept = _fit(xtime, y, begin, stop)
+    rt = np.round( np.abs( 60. / slope ) - intercept )
+    return rt, slope, intercept
+
+
+def _t_range(xtime, y, top, bottom):
+    '''Returns the time to decay 60 dB, from a fit between top and bottom dB
+    '''
+    start = np.argmax(y <= top, axis=0)
+    stop = np.argmax(y <= bottom, axis=0)
+    ok = (y[-1] <= bottom) & (stop - start > 1)
+    slope = _fit(xtime, y, start, np.where(ok, stop, start + 2))[0]
+    with np.errstate(divide='ignore'):
+        return np.where(ok, -60. / slope, np.nan)
+
+
+def _fit(xtime, y, start, stop):
+    '''Least-squares fit of each column of y, over start:stop, on xtime
+    '''
+    start = np.broadcast_to(start, y.shape[1:])
+    stop = np.broadcast_to(stop, y.shape[1:])
+    n = stop - start
+    # Sums over xtime are 1-d, and indexed directly by start and stop
+    cs = lambda a: np.concatenate((np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)))
+    cx = cs(xtime)
+    cxx = cs(xtime**2)
+    sx = cx[stop] - cx[start]
+    sxx = cxx[stop] - cxx[start]
+    ix = tuple(np.indices(y.shape[1:]))
+    c = cs(y)
+    sy = c[(stop,) + ix] - c[(start,) + ix]
+    np.multiply(xtime.reshape((-1,) + (1,) * (y.ndim - 1)), y, out=c[1:])
+    np.cumsum(c[1:], axis=0, out=c[1:])
+    sxy = c[(stop,) + ix] - c[(start,) + ix]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx**2)
+        intercept = (sy - slope * sx) / n
+    return slope, intercept
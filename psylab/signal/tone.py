@@ -23,9 +23,11 @@
 # cbrown1@pitt.edu.
 #
 
-import collections
 import numpy as np
 
+# Number of samples computed per pass when accumulating phase
+_BLOCK_SIZE = 65536
+
 def tone(f, fs, dur, **kwargs):
     '''Generates pure tones
 
@@ -59,6 +61,11 @@ def tone(f, fs, dur, **kwargs):
             starting phase of the signal. If it is an array, it must be the same 
             length as the resulting signal, and the elements of phase will be 
             the instantaneous phase of the signal. [default = 0]
+        dtype : numpy dtype
+            The dtype of the output array. [default = np.float64]
+        out : array
+            An optional 1-d array to write the signal into. If specified, its
+            length must match the resulting signal, and dtype is ignored.
 
         Returns
         -------
@@ -82,38 +89,242 @@ def tone(f, fs, dur, **kwargs):
         # Generate 2-Hz FM (with 50 Hz mod depth), on a 500-Hz carrier
         fm = tone(tone(2, 44100, 1000) * 25 + 500, 44100);
 
+        # Generate a float32 tone into a preallocated buffer
+        buf = np.empty(44100, dtype=np.float32)
+        tone(1000, 44100, 1000, out=buf);
+
     '''
 
     amp = kwargs.get('amp', 1.)
     phase = kwargs.get('phase', 0.)
+    dtype = kwargs.get('dtype', np.float64)
+    out = kwargs.get('out', None)
 
     f = np.array(np.float64(f))
     fs = np.float64(fs)
-    dur = np.int(np.round((np.float64(dur) / 1000.) * fs))
+    dur = int(np.round((np.float64(dur) / 1000.) * fs))
     amp = np.array(np.float64(amp))
     phase = np.float64(phase)*np.pi/180.
 
+    if f.size > 2:
+        dur = int(f.size)
+
+    if amp.size == 2:
+        if not amp[0] > 0 or not amp[1] > 0:
+            raise Exception('When generating amplitude sweeps, linear scaling must be used (ie., .01 < amp < 1.0')
+    elif amp.size == 1 and amp <= 0:
+        amp = 10. ** (amp / 20.)
+
+    if out is None:
+        out = np.empty(dur, dtype=dtype)
+    elif out.shape != (dur,):
+        raise ValueError("out must have shape ({},)".format(dur))
+
+    if f.size == 1 and amp.size == 1 and np.ndim(phase) == 0:
+        # Fixed frequency: accumulate phase block by block, directly in out
+        _render(out[np.newaxis], f.reshape(1) / fs, np.zeros(1),
+                np.array([phase]), amp.reshape(1))
+        return out
+
+    if out.dtype == np.float64:
+        ph = out
+    else:
+        ph = np.empty(dur)
     if f.size == 2:
-        freq = np.linspace(f[0], f[1], dur)
+        # Linear sweep; build the frequency track in place, then integrate
+        ph[:] = np.arange(dur)
+        ph *= (f[1] - f[0]) / max(dur - 1, 1)
+        ph += f[0]
+        np.cumsum(ph, out=ph)
     elif f.size == 1:
-        freq = np.ones(dur) * f
+        ph[:] = np.arange(1, dur + 1)
+        ph *= f
     else:
-        dur = np.int(f.size)
-        freq = f
+        np.cumsum(f, out=ph)
+    ph *= 2. * np.pi / fs
+    ph += phase
+    np.sin(ph, out=ph)
 
     if amp.size == 2:
-        if not amp[0] > 0 or not amp[1] > 0:
-            raise Exception('When generating amplitude sweeps, linear scaling must be used (ie., .01 < amp < 1.0')
-        amp1 = np.linspace(amp[0], amp[1], dur)
-    elif amp.size == 1:
-        if amp <= 0:
-            amp1 = np.ones(dur) * 10. ** (amp / 20.)
+        ph *= np.linspace(amp[0], amp[1], dur)
+    else:
+        ph *= amp
+
+    if ph is not out:
+        out[:] = ph
+    return out
+
+
+def tone_batch(f, fs, dur, amp=1., phase=0., dtype=np.float64, out=None):
+    '''Generates a batch of fixed-frequency pure tones in one call
+
+        Parameters
+        ----------
+        f : scalar/array
+            The frequency of each token, in Hz. 
+        fs : scalar
+            The sampling frequency.
+        dur : scalar
+            The duration in ms. 
+        amp : scalar/array
+            The amplitude of each token. As with tone, values less than or 
+            equal to 0 are treated as dB (re: +-1), and values greater than 0 
+            scale the waveform peak linearly. [default = 1]
+        phase : scalar/array
+            The starting phase of each token, in degrees. [default = 0]
+        dtype : numpy dtype
+            The dtype of the output array. [default = np.float64]
+        out : array
+            An optional array of shape (tokens, samples) to write into.
+
+        Returns
+        -------
+        y : array
+            A 2-d array of shape (tokens, samples), with one tone per row.
+
+        Notes
+        -----
+        f, amp and phase are broadcast against one another, so eg. a single 
+        frequency can be generated at a vector of levels. Each row is 
+        identical to what tone would return for the same parameters.
+
+        Example
+        -------
+        # 500 candidate tones for a frequency-discrimination track, at -10 dB
+        y = tone_batch(1000 + np.arange(500) * .1, 44100, 300, amp=-10, dtype=np.float32)
+    '''
+    f, amp, phase = np.broadcast_arrays(np.atleast_1d(np.float64(f)), 
+                                        np.atleast_1d(np.float64(amp)), 
+                                        np.atleast_1d(np.float64(phase)))
+    amp = np.where(amp <= 0, 10. ** (amp / 20.), amp)
+    fs = np.float64(fs)
+    dur = int(np.round((np.float64(dur) / 1000.) * fs))
+    if out is None:
+        out = np.empty((f.size, dur), dtype=dtype)
+    elif out.shape != (f.size, dur):
+        raise ValueError("out must have shape ({}, {})".format(f.size, dur))
+    return _render(out, f / fs, np.zeros(f.size), phase*np.pi/180., amp)
+
+
+class tone_generator:
+    """Generates pure tones in consecutive blocks, with continuous phase
+
+        Useful when stimuli are generated on the fly (eg., in a real-time 
+        audio callback), or are too long to hold in memory. Concatenating 
+        the blocks returned by get_block yields the same signal as tone (or 
+        tone_batch, if f is an array) would for the total duration.
+
+        Parameters
+        ----------
+        f : scalar/array
+            The frequency in Hz. If an array, one tone per element is 
+            generated, and blocks are 2-d (tokens, samples).
+        fs : scalar
+            The sampling frequency.
+        amp : scalar/array
+            The amplitude, using the same convention as tone. [default = 1]
+        phase : scalar/array
+            The starting phase, in degrees. [default = 0]
+        dtype : numpy dtype
+            The dtype of the returned blocks. [default = np.float64]
+
+        Example
+        -------
+        >>> g = tone_generator(1000, 44100, amp=-6, dtype=np.float32)
+        >>> a = g.get_block(512)
+        >>> b = g.get_block(512) # Picks up where a left off
+    """
+    def __init__(self, f, fs, amp=1., phase=0., dtype=np.float64):
+        self.scalar = np.ndim(f) == 0
+        f, amp, phase = np.broadcast_arrays(np.atleast_1d(np.float64(f)), 
+                                            np.atleast_1d(np.float64(amp)), 
+                                            np.atleast_1d(np.float64(phase)))
+        self.f = f.copy()
+        self.fs = np.float64(fs)
+        self.amp = np.where(amp <= 0, 10. ** (amp / 20.), amp)
+        self.phase = phase*np.pi/180.
+        self.dtype = dtype
+        self.reset()
+
+    def reset(self):
+        """Rewinds the generator to the start of the tone
+        """
+        self.cycles = np.zeros(self.f.size)
+        self.n = 0
+
+    def get_block(self, n, out=None):
+        """Returns the next n samples
+
+            Parameters
+            ----------
+            n : int
+                The number of samples to generate.
+            out : array
+                An optional array to write into. Its shape must be (n,) if f 
+                is a scalar, or (tokens, n) otherwise.
+
+            Returns
+            -------
+            y : array
+                The next block of samples.
+        """
+        n = int(n)
+        if out is None:
+            out = np.empty((self.f.size, n), dtype=self.dtype)
+            ret = out[0] if self.scalar else out
         else:
-            amp1 = np.ones(dur) * amp
+            shape = (n,) if self.scalar else (self.f.size, n)
+            if out.shape != shape:
+                raise ValueError("out must have shape {}".format(shape))
+            ret = out
+            # Index rather than reshape, so that out is always written to
+            out = out[np.newaxis] if self.scalar else out
+        _render(out, self.f / self.fs, self.cycles, self.phase, self.amp)
+        # Keep only the fractional cycle count, so precision does not degrade
+        self.cycles = np.remainder(self.cycles + self.f * n / self.fs, 1.)
+        self.n += n
+        return ret
+
+
+def _render(out, cps, cycles, phase, amp):
+    """Fills a 2-d (tokens, samples) array with sinusoids
+
+        cps is cycles per sample, and cycles is the fractional cycle count 
+        at the sample preceding out[:,0]. The phase is accumulated in cycles 
+        and wrapped to [0,1) before conversion to radians (which also makes 
+        np.sin considerably faster), and is computed in float64 blocks so 
+        that float32 output does not lose precision on long signals.
+    """
+    ntok, n = out.shape
+    step = max(_BLOCK_SIZE // max(ntok, 1), 1)
+    idx = np.arange(1, min(step, n) + 1, dtype=np.float64)
+    whole = np.empty((ntok, min(step, n)))
+    if out.dtype == np.float64:
+        scratch = None
     else:
-        amp1 = amp
+        scratch = np.empty((ntok, min(step, n)))
+    cps = cps[:, np.newaxis]
+    cycles = cycles[:, np.newaxis]
+    phase = phase[:, np.newaxis]
+    amp = amp[:, np.newaxis]
+    for start in range(0, n, step):
+        m = min(step, n - start)
+        if scratch is None:
+            buf = out[:, start:start+m]
+        else:
+            buf = scratch[:, :m]
+        np.multiply(idx[:m] + start, cps, out=buf)
+        buf += cycles
+        np.floor(buf, out=whole[:, :m])
+        buf -= whole[:, :m]
+        buf *= 2. * np.pi
+        buf += phase
+        np.sin(buf, out=buf)
+        buf *= amp
+        if scratch is not None:
+            out[:, start:start+m] = buf
+    return out
 
-    return amp1 * np.sin(phase + (2. * np.pi * np.cumsum(freq) / fs))
 
 def tcomplex(f, fs, dur, **kwargs):
     #, amp=1, ncomponents=100, offset=0, phase=0):
@@ -145,29 +356,98 @@ def tcomplex(f, fs, dur, **kwargs):
             offset in Hz. Eg., offset = 2 would yield 102, 202, 302, 402, etc.
               (array of length ncomponents allows setting offset of each 
               component separately) Ignored if f is an array. default = 0
-        phase : scalar or array-like
-            starting phase of each component. (array of length ncomponents 
-            allows setting phase of each component separately) default = 0 
+        phase : scalar, array-like, or string
+            starting phase of each component, in degrees. (array of length 
+            ncomponents allows setting phase of each component separately) 
+            Can also be one of the following strings:
+              'sine' : all components in sine phase [same as 0]
+              'cosine' : all components in cosine phase [same as 90]
+              'schroeder' : positive Schroeder phase (low crest factor)
+              'schroeder-' : negative Schroeder phase
+              'random' : a random starting phase for each component
+            default = 0 
+        method : string
+            How to synthesize the complex:
+              'fft' : construct the spectrum and inverse fft it. This is 
+                fastest, but only possible if every component falls exactly 
+                on an fft bin of a signal of the requested length (eg., 
+                integer frequencies and a duration of 1 s).
+              'sum' : accumulate the components in blocks of samples.
+              'auto' : use 'fft' when possible, otherwise 'sum' [default]
+        dtype : numpy dtype
+            The dtype of the output array. [default = np.float64]
 
         Returns
         -------
         y : array
             The waveform
+
+        Notes
+        -----
+        Neither method holds a (samples x components) array in memory, so 
+        long complexes with many components can be generated quickly.
+
+        Schroeder phases are computed as +-180*n*(n-1)/N degrees, where n is 
+        the component number and N the number of components (Schroeder, M.R. 
+        (1970). Synthesis of low-peak-factor signals and binary sequences with 
+        low autocorrelation. IEEE Trans Inf Theory, 16, 85-89).
     '''
 
     amp = np.float64(kwargs.get('amp', 1.))
-    phase = np.float64(kwargs.get('phase', 0.))
-    ncomponents = np.float64(kwargs.get('ncomponents', 100.))
+    phase = kwargs.get('phase', 0.)
+    ncomponents = int(kwargs.get('ncomponents', 100))
     offset = np.float64(kwargs.get('offset', 0.))
+    method = kwargs.get('method', 'auto')
+    dtype = kwargs.get('dtype', np.float64)
 
-    if amp <= 0:
-        amp = 10. ** (amp / 20.)
-    dur_s = np.int(np.round((dur / 1000.) * fs))
-    phase_r = phase*np.pi/180.
+    if method not in ['auto', 'fft', 'sum']:
+        raise ValueError("method must be one of 'auto', 'fft', 'sum'")
 
-    if isinstance(f, (collections.Sequence, np.ndarray)):
-        fh = f
+    if np.ndim(f) > 0:
+        fh = np.array(f, dtype=np.float64)
     else:
-        fh = ((np.arange(ncomponents) + 1) * f) + offset
-    out = np.sin(phase_r + 2*np.pi * np.cumsum(np.ones((dur_s,fh.size))*fh,axis=0) / fs) * amp
-    return out.sum(axis=1)
+        fh = ((np.arange(ncomponents) + 1) * np.float64(f)) + offset
+    nc = fh.size
+
+    amp = np.where(amp <= 0, 10. ** (amp / 20.), amp) * np.ones(nc)
+    if isinstance(phase, str):
+        n = np.arange(1, nc + 1)
+        if phase == 'sine':
+            phase = np.zeros(nc)
+        elif phase == 'cosine':
+            phase = np.ones(nc) * 90.
+        elif phase in ['schroeder', 'schroeder+']:
+            phase = 180. * n * (n - 1) / nc
+        elif phase == 'schroeder-':
+            phase = -180. * n * (n - 1) / nc
+        elif phase == 'random':
+            phase = np.random.uniform(0, 360, nc)
+        else:
+            raise ValueError("phase must be a number, an array, or one of 'sine', 'cosine', 'schroeder', 'schroeder-', 'random'")
+    phase_r = np.float64(phase) * np.pi / 180. * np.ones(nc)
+
+    dur_s = int(np.round((dur / 1000.) * fs))
+    bins = fh * dur_s / np.float64(fs)
+    on_bins = np.all(np.abs(bins - np.round(bins)) < 1e-8) and \
+              np.all(bins > 0) and np.all(bins < dur_s / 2.)
+    if method == 'fft' and not on_bins:
+        raise ValueError("method 'fft' requires every component to fall on an fft bin below Nyquist")
+
+    if method == 'sum' or not on_bins:
+        out = np.empty(dur_s, dtype=dtype)
+        step = max(_BLOCK_SIZE // nc, 256)
+        scratch = np.empty((nc, min(step, dur_s)))
+        cps = fh / np.float64(fs)
+        for start in range(0, dur_s, step):
+            m = min(step, dur_s - start)
+            block = _render(scratch[:, :m], cps, np.remainder(cps * start, 1.), phase_r, amp)
+            out[start:start+m] = block.sum(axis=0)
+        return out
+
+    # Each component is amp * sin(phase + 2*pi*k*(n+1)/N), which is the real 
+    # part of a single complex exponential at bin k
+    k = np.round(bins).astype(int)
+    spec = np.zeros(dur_s // 2 + 1, dtype=np.complex128)
+    np.add.at(spec, k, (dur_s / 2.) * amp * 
+              np.exp(1j * (phase_r + 2. * np.pi * k / dur_s - np.pi / 2.)))
+    return np.fft.irfft(spec, dur_s).astype(dtype, copy=False)
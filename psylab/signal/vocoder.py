@@ -27,8 +27,7 @@ import numpy as np
 from scipy.signal import filter_design as filters, lfilter, filtfilt
 import scipy.signal
 from .tone import tone
-from .peakpick import pick_peaks
-from .zeropad import zeropad
+from .peakpick import pick_peaks, apply_peaks
 from .filter import filter_bank
 from .frequency import logspace
 
@@ -209,15 +208,10 @@ def vocoder_vect(signal, fs, channels, inlo, inhi, **kwargs):
         carriers = np.sin(2*np.pi * np.cumsum(np.ones((signal.size,channels))*fcarriers,axis=0) / fs)
     
     if ace:
-        wsize = np.round((.02)*fs) # 20ms analysis window
-        peaks,rms = pick_peaks(voc, ace, wsize) 
-        carriers, peaks, rms = zeropad(carriers,peaks,rms)
-        # Generate 1-d index array
-        indices = peaks.ravel() + np.repeat(range(0, carriers.shape[1]*carriers.shape[0], carriers.shape[1]), peaks.shape[1])
-        # Pull out the carriers, atten
-        out = rms.ravel()[indices] * carriers.ravel()[indices]
-        # Back to 2-d
-        voc = out.reshape(peaks.shape)
+        wsize = int(np.round((.02)*fs)) # 20ms analysis window
+        peaks,rms = pick_peaks(envelopes, ace, wsize, expand=False)
+        # Pull out the carriers, atten, window by window
+        voc = apply_peaks(carriers, peaks, rms, wsize)
         
     else:
         # Modulate
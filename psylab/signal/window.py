@@ -27,6 +27,15 @@ import numpy as np
 from numpy.lib.stride_tricks import as_strided
 from itertools import product
 
+# Window functions by name, for functions that take a window type
+_windows = {
+    'flat': np.ones,
+    'hanning': np.hanning,
+    'hamming': np.hamming,
+    'bartlett': np.bartlett,
+    'blackman': np.blackman,
+}
+
 
 def win_attack(ws, rs, ramp_fun=np.bartlett):
     """generates a window of length ws that is ramped (ramp
@@ -198,3 +207,122 @@ def sliding_window(sig, ws, ss = None, flatten = True):
     # remove any dimensions with size 1
     dim = list(filter(lambda i : i != 1,dim)) # Added list for py3 compat; py3 filter returns generator
     return strided.reshape(dim)
+
+
+class windower(object):
+    '''Returns sliding windows over a signal that arrives in blocks
+
+        Blocks of any size can be passed to process, which returns each 
+        window that they complete, as in sliding_window(sig, ws, ss) on 
+        the whole signal. Samples are copied once into an internal 
+        buffer, and the windows are strided views into that buffer.
+
+        Parameters
+        ----------
+        ws : int
+            The window size, in samples
+        ss : int
+            The step size (hop), in samples. If not specified, it defaults 
+            to ws. Overlap is ws - ss.
+        size : int
+            The initial size of the buffer, in samples. It grows as needed.
+
+        Notes
+        -----
+        Samples are along axis 0, and any other axes (eg., channels) are 
+        kept. The windows returned by process are only valid until the next
+        call to process or flush; copy them if they need to be kept.
+
+        Example
+        -------
+        >>> w = psylab.signal.windower(1024, 512)
+        >>> for block in blocks:
+        ...     frames = w.process(block) # frames x 1024 x channels
+        ...     levels = np.sqrt(np.mean(frames**2, axis=1))
+    '''
+    def __init__(self, ws, ss=None, size=None):
+        self.ws = int(ws)
+        self.ss = self.ws if ss is None else int(ss)
+        if self.ws < 1 or self.ss < 1:
+            raise ValueError("ws and ss must be >= 1")
+        self.size = 4 * self.ws if size is None else max(int(size), self.ws)
+        self.reset()
+
+    def reset(self):
+        '''Clears the buffer
+        '''
+        self.buf = None
+        self.start = 0 # The first sample of the next window
+        self.end = 0 # The end of the samples in the buffer
+        self.skip = 0 # Samples still to be skipped, when ss > ws
+        self.covered = 0 # The end of the last window
+
+    def process(self, sig):
+        '''Adds a block of samples and returns the windows it completes
+
+            Parameters
+            ----------
+            sig : array
+                The next block of the signal.
+
+            Returns
+            -------
+            y : array
+                The completed windows (possibly none), as an array of 
+                shape (windows, ws) + sig.shape[1:].
+        '''
+        sig = np.asarray(sig)
+        if self.buf is None:
+            self.buf = np.empty((self.size,) + sig.shape[1:], dtype=sig.dtype)
+        if self.skip:
+            n = min(self.skip, sig.shape[0])
+            sig = sig[n:]
+            self.skip -= n
+        n = sig.shape[0]
+        if self.end + n > self.buf.shape[0]:
+            # Move the samples that are still needed to the front
+            keep = self.end - self.start
+            if keep + n > self.buf.shape[0]:
+                buf = np.empty((max(keep + n, 2 * self.buf.shape[0]),) + self.buf.shape[1:], dtype=self.buf.dtype)
+            else:
+                buf = self.buf
+            buf[:keep] = self.buf[self.start:self.end]
+            self.buf = buf
+            self.covered -= self.start
+            self.start = 0
+            self.end = keep
+        self.buf[self.end:self.end + n] = sig
+        self.end += n
+
+        avail = self.end - self.start
+        nframes = (avail - self.ws) // self.ss + 1 if avail >= self.ws else 0
+        if not nframes:
+            return np.empty((0, self.ws) + self.buf.shape[1:], dtype=self.buf.dtype)
+        seg = self.buf[self.start:self.start + (nframes - 1) * self.ss + self.ws]
+        rest = self.buf.shape[1:]
+        frames = sliding_window(seg, (self.ws,) + rest, (self.ss,) + rest, flatten=False)
+        frames = frames[(slice(None),) + (0,) * len(rest)]
+        self.covered = self.start + (nframes - 1) * self.ss + self.ws
+        self.start += nframes * self.ss
+        if self.start > self.end:
+            self.skip = self.start - self.end
+            self.start = self.end
+        return frames
+
+    def flush(self):
+        '''Zero pads the remaining samples into a last window, if needed
+
+            Returns
+            -------
+            y : array
+                A window containing the samples that are not yet in any 
+                window, or no windows if there are none. The buffer is 
+                then cleared.
+        '''
+        if self.buf is None or self.end <= self.covered:
+            frames = np.empty((0, self.ws) + (() if self.buf is None else self.buf.shape[1:]))
+        else:
+            pad = self.ws - (self.end - self.start)
+            frames = self.process(np.zeros((pad,) + self.buf.shape[1:], dtype=self.buf.dtype)).copy()
+        self.reset()
+        return frames
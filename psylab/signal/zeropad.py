@@ -61,3 +61,62 @@ def zeropad( *args ):
                 out[n] = np.concatenate((args[n], np.zeros((length-args[n].shape[0],args[n].shape[1]))))
                 
     return tuple(out)
+
+
+def zeropad_batch(signals, length=None, dtype=None, filename=None):
+    '''Zero pads a number of signals into a single array, one signal per row
+        
+        The output array is allocated once, and each signal is copied into 
+        it once.
+    
+        Parameters
+        ----------
+        signals: list of arrays
+            The signals, which can be of varying length along their first 
+            dimension. Any other dimensions (eg., channels) must match.
+        length : int
+            The length to pad to. The default is the length of the longest 
+            signal. Longer signals are truncated.
+        dtype : dtype
+            The dtype of the output (eg., np.float32). The default is the 
+            common dtype of the signals.
+        filename : str
+            If specified, the output is a memory-mapped .npy file, created 
+            at this path, rather than an array in memory.
+
+        Returns
+        -------
+        y : array
+            The padded signals, of shape (signals, length) + any channels.
+        lengths : array
+            The number of samples of each signal in y.
+        mask : array
+            A boolean array of shape (signals, length), which is True where 
+            y holds signal, and False where it is padding.
+            
+        Example
+        -------
+        # Assume tokens is a list of 1-d arrays of varying length
+        y, lengths, mask = zeropad_batch(tokens, dtype=np.float32)
+        rms = np.sqrt(np.sum(y**2, axis=1) / lengths)
+    '''
+    signals = [np.asarray(sig) for sig in signals]
+    if len(set(sig.shape[1:] for sig in signals)) > 1:
+        raise ValueError("All signals must have the same shape, except along the first dimension")
+    lengths = np.array([sig.shape[0] for sig in signals], dtype=int)
+    if length is None:
+        length = lengths.max() if lengths.size else 0
+    lengths = np.minimum(lengths, length)
+    rest = signals[0].shape[1:] if signals else ()
+    if dtype is None:
+        dtype = np.result_type(*signals) if signals else float
+    shape = (len(signals), length) + rest
+    if filename is None:
+        out = np.zeros(shape, dtype=dtype)
+    else:
+        # New .npy files are zero filled
+        out = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+    for row, sig, n in zip(out, signals, lengths):
+        row[:n] = sig[:n]
+    mask = np.arange(length) < lengths[:, np.newaxis]
+    return out, lengths, mask
@@ -40,3 +40,23 @@ def test_atten_3():
     np_testing.assert_allclose(ref, ret)
 
 
+
+def test_atten_channels():
+    # A vector of dB values, one per channel, in place and in float32
+    np.random.seed(0)
+    c = np.random.randn(100, 3).astype(np.float32)
+    ref = c.astype(float) * 10**(-np.array([0, 6, 20])/20.)
+    ret = psylab.signal.atten(c, [0, 6, 20], out=c)
+    assert ret is c
+    assert ret.dtype == np.float32
+    np_testing.assert_allclose(ret, ref, rtol=1e-3)
+    assert psylab.signal.atten(c, 3).dtype == np.float32
+
+
+def test_atten_int16():
+    # Integer output is rounded and saturated
+    a = np.array([[1000, -1000], [30000, -30000], [-32768, 32767]], dtype=np.int16)
+    ref = np.array([[1995, -1995], [32767, -32768], [-32768, 32767]], dtype=np.int16)
+    ret = psylab.signal.atten(a, -6, out=a)
+    assert ret.dtype == np.int16
+    np_testing.assert_array_equal(ret, ref)
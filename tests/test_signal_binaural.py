@@ -46,3 +46,60 @@ def test_gso_1():
     out = psylab.signal.gso(arr_in, 1.)
     np.testing.assert_allclose(out[:,0], out[:,1])
 
+
+def test_apply_itd_1():
+    ref = np.array([[0., 1.], [0., 1.], [1., 1.], [1., 1.], [1., 1.], [1., 0.], [1., 0.]])
+    np.testing.assert_allclose(psylab.signal.apply_itd(np.ones(5), 5, 400000), ref)
+    np.testing.assert_allclose(psylab.signal.apply_itd(np.ones(5), 5, 400000, method='fft'), ref, atol=1e-12)
+
+def _gauss_tone(t, f=500., sd=.007):
+    return np.exp(-.5 * ((t - .05) / sd)**2) * np.sin(2 * np.pi * f * t)
+
+def test_apply_itd_fft():
+    fs = 48000
+    t = np.arange(4800) / float(fs)
+    itds = np.array([-100., -7.5, 0., 3., 12.5, 250.])
+    out = psylab.signal.apply_itd(_gauss_tone(t), fs, itds, method='fft')
+    assert out.shape == (6, 4812, 2)
+    t = np.arange(4812) / float(fs)
+    for o, itd in zip(out, itds):
+        np.testing.assert_allclose(o[:, 0], _gauss_tone(t - max(itd, 0) / 1e6), atol=1e-9)
+        np.testing.assert_allclose(o[:, 1], _gauss_tone(t - max(-itd, 0) / 1e6), atol=1e-9)
+
+def test_dynamic_itd():
+    fs = 48000
+    t = np.arange(4800) / float(fs)
+    sig = _gauss_tone(t)
+    # Integer delays are exact, fractional ones are close; the latency is 16
+    for itd, atol in [(125., 1e-12), (-62.5, 1e-12), (33., 1e-4)]:
+        d = psylab.signal.dynamic_itd(fs, max_itd=500)
+        out = np.concatenate([d.process(sig[i:i+1000], itd) for i in range(0, 4800, 1000)] + [d.flush()])
+        ref = psylab.signal.apply_itd(sig, fs, itd, method='fft')
+        np.testing.assert_allclose(out[16:16+ref.shape[0]], ref, atol=atol)
+
+def test_dynamic_itd_per_sample():
+    # A per-sample itd, held constant, is the same as a scalar itd
+    sig = np.random.randn(1000, 2)
+    ref = psylab.signal.dynamic_itd(44100).process(sig, -300.)
+    ret = psylab.signal.dynamic_itd(44100).process(sig, np.full(1000, -300.))
+    np.testing.assert_allclose(ret, ref)
+
+def test_gso_batch():
+    np.random.seed(0)
+    x = np.random.randn(4, 500, 2)
+    rhos = np.array([0., .5, .9, 1.])
+    y = psylab.signal.gso_batch(x, rhos)
+    assert y.shape == (4, 4, 500, 2)
+    for i in range(4):
+        for j in range(4):
+            np.testing.assert_allclose(y[i, j], psylab.signal.gso(x[i], rhos[j]))
+            l, r = y[i, j].T
+            np.testing.assert_allclose(np.sum(l*r) / np.sqrt(np.sum(l**2) * np.sum(r**2)), rhos[j], atol=1e-10)
+    np.testing.assert_allclose(psylab.signal.gso_batch(x[0], .5), psylab.signal.gso(x[0], .5))
+
+def test_gso_batch_noise():
+    y1 = psylab.signal.gso_batch((6, 1000), [.2, .8], seed=5)
+    y2 = psylab.signal.gso_batch((6, 1000), [.2, .8], seed=5, workers=3)
+    assert y1.shape == (6, 2, 1000, 2)
+    np.testing.assert_array_equal(y1, y2)
+    assert not np.allclose(y1[0], y1[1])
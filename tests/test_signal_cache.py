@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import os
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def test_memoize_1():
+    tone = psylab.signal.memoize(psylab.signal.tone)
+    a = tone(1000, 44100, 100)
+    b = tone(1000, 44100, 100)
+    c = tone(1000, 44100, 100, amp=.5)
+    assert a is b
+    assert not a.flags.writeable
+    np_testing.assert_allclose(a * .5, c)
+    info = tone.cache_info()
+    assert info['hits'] == 1 and info['misses'] == 2 and info['entries'] == 2
+
+
+def test_memoize_arrays():
+    calls = []
+
+    @psylab.signal.memoize(maxbytes=800*2)
+    def double(x):
+        calls.append(1)
+        return x * 2
+
+    double(np.arange(100.))
+    double(np.arange(100.))
+    assert len(calls) == 1
+    double(np.arange(100.) + 1)
+    double(np.arange(100.) + 2)
+    info = double.cache_info()
+    assert info['evictions'] == 1
+    assert info['nbytes'] <= 1600
+    double(np.arange(100.))
+    assert len(calls) == 4
+
+
+def test_disk_cache_1(tmpdir):
+    cache = psylab.signal.disk_cache(str(tmpdir))
+    sig = psylab.signal.tone(500, 44100, 100)
+    a = cache(psylab.signal.atten, sig, 6)
+    b = cache(psylab.signal.atten, sig, 6)
+    np_testing.assert_allclose(psylab.signal.atten(sig, 6), b)
+    assert isinstance(b, np.memmap)
+    assert not b.flags.writeable
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache(psylab.signal.atten, sig, 3)
+    assert cache.misses == 2
+
+
+def test_disk_cache_evict(tmpdir):
+    cache = psylab.signal.disk_cache(str(tmpdir), maxbytes=3000)
+    tone = cache.wrap(psylab.signal.tone)
+    for f in (100, 200, 300):
+        tone(f, 10000, 100) # 8000 bytes each
+    tone(400, 1000, 100)
+    assert cache.get_size() <= 3000
+    cache.clear()
+    assert cache.get_size() == 0
+
+
+class _Setting(object):
+    # The default repr has a memory address
+    def __init__(self, value):
+        self.value = value
+
+
+def test_disk_cache_keys(tmpdir):
+    cache = psylab.signal.disk_cache(str(tmpdir))
+    def f(x):
+        return x*2
+    a = cache(f, np.ones(3))
+    def f(x):
+        return x*3
+    b = cache(f, np.ones(3))
+    np_testing.assert_allclose(b, [3, 3, 3])
+    def f(x, gain=4):
+        return x*gain
+    np_testing.assert_allclose(cache(f, np.ones(3)), [4, 4, 4])
+    def f(x, gain=5):
+        return x*gain
+    np_testing.assert_allclose(cache(f, np.ones(3)), [5, 5, 5])
+    assert cache.misses == 4
+    # Objects are keyed on their contents, not their address
+    g = lambda x, s: x*s.value
+    assert cache.get_key(g, (1, _Setting(2)), {}) == cache.get_key(g, (1, _Setting(2)), {})
+    assert cache.get_key(g, (1, _Setting(2)), {}) != cache.get_key(g, (1, _Setting(3)), {})
+    assert cache.get_key(g, (1,), {}) != psylab.signal.disk_cache(str(tmpdir), version=2).get_key(g, (1,), {})
+
+
+def test_disk_cache_tmp(tmpdir):
+    cache = psylab.signal.disk_cache(str(tmpdir))
+    stale = tmpdir.join('abandoned.tmp')
+    stale.write('')
+    os.utime(str(stale), (0, 0))
+    fresh = tmpdir.join('writing.tmp')
+    fresh.write('')
+    cache.evict(0)
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_memoize_caller_arrays():
+    # Arrays the caller owns are not made read-only
+    table = np.arange(10.)
+    f = psylab.signal.memoize(lambda x, out: np.multiply(x, 2, out=out))
+    out = np.zeros(10)
+    a = f(table, out)
+    assert out.flags.writeable
+    assert not a.flags.writeable
+    g = psylab.signal.memoize(lambda x: x[::2])
+    b = g(table)
+    assert table.flags.writeable
+    table[0] = 100
+    assert b[0] == 0
+
+
+def test_memoize_out():
+    # out is filled on hits and misses, and is not part of the key
+    m = psylab.signal.memoize(psylab.signal.mix)
+    a = np.ones(3)
+    b = np.ones(10)*4
+    ref = psylab.signal.mix(a, b)
+    for i in range(2):
+        out = np.zeros(10)
+        ret = m(a, b, out=out)
+        assert ret is out
+        assert out.flags.writeable
+        np_testing.assert_allclose(out, ref)
+    assert m.cache_info()['hits'] == 1
+    np_testing.assert_allclose(m(a, b), ref)
+    assert m.cache_info()['hits'] == 2
+
+
+def test_disk_cache_out(tmpdir):
+    cache = psylab.signal.disk_cache(str(tmpdir))
+    a = np.ones(3)
+    b = np.ones(10)*4
+    for i in range(2):
+        out = np.zeros(10)
+        assert cache(psylab.signal.mix, a, b, out=out) is out
+        np_testing.assert_allclose(out, psylab.signal.mix(a, b))
+    assert (cache.hits, cache.misses) == (1, 1)
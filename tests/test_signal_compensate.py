@@ -12,3 +12,24 @@ def test_compensate_1():
     out = psylab.signal.compensate(tone,fs,np.array([[200,-3]]))
     np.testing.assert_allclose(ref, out, atol=1e-3)
 
+
+
+def test_compensate_2():
+    fs = 8000
+    x = np.random.randn(fs, 2)
+    comp = np.array([[200, -3], [1000, -6], [3000, 4]])
+    out = psylab.signal.compensate(x, fs, comp)
+    for i in range(2):
+        np_testing.assert_allclose(psylab.signal.compensate(x[:, i], fs, comp), out[:, i])
+    np_testing.assert_allclose(out.T, psylab.signal.compensate(x.T, fs, comp, axis=1))
+
+
+def test_compensator_1():
+    fs = 8000
+    x = np.random.randn(fs, 2)
+    comp = np.array([[200, -3], [1000, -6], [3000, 4]])
+    c = psylab.signal.compensator(fs, comp, 256)
+    h = np.abs(np.fft.rfft(c.b, fs))
+    np_testing.assert_allclose(20 * np.log10(h[[1000, 3000]]), [-6, 4], atol=0.1)
+    out = np.concatenate([c.process(x[i:i+300]) for i in range(0, fs, 300)])
+    np_testing.assert_allclose(psylab.signal.lfilter(c.b, 1, x, axis=0), out, atol=1e-12)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def peak_detect_loop(sig, fs, attack, release):
+    alpha = np.exp(-1. / ((attack/1000.)*fs))
+    beta = np.exp(-1. / ((release/1000.)*fs))
+    d = np.zeros_like(sig)
+    for i in range(1, len(sig)):
+        if sig[i] < d[i-1]:
+            d[i] = d[i-1] * beta
+        else:
+            d[i] = d[i-1] * alpha + sig[i] * (1-alpha)
+    return d
+
+
+def test_envelope_follower_1():
+    fs = 44100
+    np.random.seed(0)
+    sig = psylab.signal.tone(200, fs, 500) * np.linspace(0, 1, 22050)
+    sig[5000:6000] += np.random.randn(1000) * .1
+    ref = peak_detect_loop(sig, fs, 5, 50)
+    ef = psylab.signal.envelope_follower(fs, 5, 50)
+    ret = np.concatenate([ef.process(sig[i:i+1000]) for i in range(0, sig.size, 1000)])
+    np_testing.assert_array_equal(ref, ret)
+
+
+def test_compress_channels():
+    fs = 44100
+    sig = psylab.signal.tone(500, fs, 200)
+    sig2 = np.vstack((sig, sig * .1)).T
+    ret = psylab.signal.compress(sig2, fs, 80, 3, 5, 50)
+    for i in range(2):
+        ref = psylab.signal.compress(sig2[:,i], fs, 80, 3, 5, 50)
+        np_testing.assert_array_equal(ref, ret[:,i])
+
+
+def test_compressor_blocks():
+    fs = 44100
+    sig = psylab.signal.tone(500, fs, 200) * np.linspace(0, 1, 8820)
+    ref = psylab.signal.compress(sig, fs, 80, 3, 5, 50, delay_audio=True)
+    c = psylab.signal.compressor(fs, 80, 3, 5, 50, delay_audio=True)
+    ret = np.concatenate([c.process(sig[i:i+64]) for i in range(0, sig.size, 64)])
+    np_testing.assert_array_equal(ref, ret)
+
+
+def test_multiband_compress_reconstruction():
+    fs = 22050
+    np.random.seed(0)
+    sig = np.random.randn(fs) * .01
+    # Threshold well above the signal, so the bands should sum to the input
+    ret = psylab.signal.multiband_compress(sig, fs, (250, 500, 1000, 2000, 4000), 130, 3, 5, 50)
+    np_testing.assert_allclose(sig, ret, atol=1e-12)
+
+
+def test_multiband_compressor_blocks():
+    fs = 22050
+    np.random.seed(0)
+    sig = np.random.randn(fs // 4) * .3
+    xo = (500, 1000, 2000)
+    ref = psylab.signal.multiband_compress(sig, fs, xo, 60, (1.5, 2, 3, 3), 5, 50, band_gain=10)
+    c = psylab.signal.multiband_compressor(fs, xo, 60, (1.5, 2, 3, 3), 5, 50, band_gain=10)
+    x = np.concatenate((sig, np.zeros(c.delay)))
+    ret = np.concatenate([c.process(x[i:i+500]) for i in range(0, x.size, 500)])[c.delay:]
+    np_testing.assert_allclose(ref, ret, atol=1e-12)
+
+
+def test_peak_detect_fallback(monkeypatch):
+    # The pure-python detector matches the loop (compiled if numba is installed)
+    from psylab.signal import compression
+    fs = 44100
+    np.random.seed(0)
+    sig = np.random.randn(fs // 4, 2)
+    sig[2000:8000] = 0
+    ref = psylab.signal.envelope_follower(fs, 5, 50).process(sig)
+    monkeypatch.setattr(compression, '_peak_loop', None)
+    ret = psylab.signal.envelope_follower(fs, 5, 50).process(sig)
+    np_testing.assert_array_equal(ref, ret)
+    np_testing.assert_array_equal(ref[:,0], peak_detect_loop(sig[:,0], fs, 5, 50))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def voice(f0, fs, dur=1.):
+    t = np.arange(int(fs * dur)) / float(fs)
+    ph = 2 * np.pi * f0 * t
+    x = sum(np.sin(k * ph) / k**2 for k in range(1, 4))
+    return x * ((t > 0.2) & (t < 0.8))
+
+
+def test_f0_1():
+    fs = 16000
+    x = np.stack((voice(120, fs), voice(200, fs)), axis=1)
+    y = psylab.signal.f0(x, fs)
+    assert y.shape == x.shape
+    for i in range(2):
+        np_testing.assert_allclose(psylab.signal.f0(x[:, i], fs), y[:, i])
+    np_testing.assert_allclose(y[8000], [120, 200], rtol=0.02)
+
+    y = psylab.signal.f0(x, fs, frame_rate=100)
+    assert y.shape == (100, 2)
+    np_testing.assert_allclose(y[50], [120, 200], rtol=0.02)
+    assert np.all(y[:10] < 1)
+
+
+def test_f0_tracker():
+    fs = 16000
+    x = np.stack((voice(120, fs), voice(200, fs)), axis=1)
+    ref = psylab.signal.f0_tracker(fs).process(x)
+    t = psylab.signal.f0_tracker(fs)
+    ret = np.concatenate([t.process(x[i:i+333]) for i in range(0, x.shape[0], 333)])
+    np_testing.assert_allclose(ref, ret, atol=1e-9)
+    assert ref.shape == (99, 2)
+    np_testing.assert_allclose(ref[60], [120, 200], rtol=0.05)
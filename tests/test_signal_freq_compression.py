@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+from psylab.signal import freq_compression
+
+
+def solafs_loop(x, w_ov, s_s, s_a, k_max):
+    beta = np.linspace(1, 0, w_ov)
+    w = s_s + w_ov
+    size = int(x.size * float(s_s) / s_a)
+    nframes = int(np.ceil(size / float(s_s)))
+    y = np.zeros(nframes * s_s + w_ov)
+    x = np.concatenate((x, np.zeros(nframes * s_a + k_max + w)))
+    for m in range(nframes):
+        r = np.zeros(k_max + 1)
+        c = np.sum(y[m*s_s:m*s_s + w_ov]**2)
+        for k in range(k_max + 1):
+            seg = x[m*s_a + k:m*s_a + k + w_ov]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r[k] = np.sum(seg * y[m*s_s:m*s_s + w_ov]) / (np.sqrt(np.sum(seg**2)) * np.sqrt(c))
+        k_m = 0
+        k_m_corr = 0 if np.isnan(r[0]) else r[0]
+        for k in range(1, r.size):
+            if np.isfinite(r[k]) and r[k] > k_m_corr:
+                k_m = k
+                k_m_corr = r[k]
+        x_m = x[m*s_a + k_m:m*s_a + k_m + w]
+        y[m*s_s:m*s_s + w_ov] = beta * y[m*s_s:m*s_s + w_ov] + (1 - beta) * x_m[:w_ov]
+        y[m*s_s + w_ov:m*s_s + w] = x_m[w_ov:]
+    return y[:size]
+
+
+def test_solafs_offline_1():
+    fs = 8000
+    x = psylab.signal.tone(150, fs, 300) * (1 + psylab.signal.tone(4, fs, 300))
+    ref = solafs_loop(x, 40, 200, 240, 30)
+    ret = freq_compression.solafs_offline(x, 40, 200, 240, 30)
+    np_testing.assert_allclose(ref, ret, atol=1e-12)
+
+
+def test_solafs_stream():
+    fs = 8000
+    x = psylab.signal.tone(150, fs, 300) * (1 + psylab.signal.tone(4, fs, 300))
+    for s_a in (160, 240):
+        ref = freq_compression.solafs_offline(x, 40, 200, s_a, 30)
+        s = freq_compression.solafs(40, 200, s_a, 30)
+        ret = np.concatenate([s.process(x[i:i+100]) for i in range(0, x.size, 100)] + [s.flush()])
+        np_testing.assert_allclose(ref, ret, atol=1e-12)
+
+
+def tdhs_loop(x, window, overlap):
+    y = np.zeros(x.size)
+    i = 0
+    j = 0
+    while j + window.size < x.size:
+        y[i:i+window.size] += window * x[j:j+window.size]
+        i += window.size - overlap
+        j += window.size
+    return y
+
+
+def test_tdhs_1():
+    x = np.random.randn(10000, 2)
+    for window, overlap in ((400, 50), (400, 200), (100, 37), (400, 400)):
+        w = np.hanning(window)
+        for n in (10000, 8000, 8001, 10):
+            ret = freq_compression.tdhs(x[:n], w, overlap)
+            for i in range(2):
+                np_testing.assert_allclose(tdhs_loop(x[:n, i], w, overlap), ret[:, i], atol=1e-12)
+
+
+def test_freq_compressor():
+    fs = 8000
+    x = psylab.signal.tone(150, fs, 500) * (1 + psylab.signal.tone(4, fs, 500))
+    for semitones in (1, 3, 12):
+        ref = psylab.signal.freq_compress(x, semitones)
+        c = psylab.signal.freq_compressor(semitones)
+        ret = np.concatenate([c.process(x[i:i+256]) for i in range(0, x.size, 256)] + [c.flush()])
+        np_testing.assert_allclose(ref, ret, atol=1e-12)
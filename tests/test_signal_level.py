@@ -11,7 +11,22 @@ def test_spl2hl():
     assert ref == ret
 
 def test_hl2spl():
-    ref = 17
-    ret = psylab.signal.spl2hl(28,750)
+    ref = 19 # 28 - 9.0, the conversion at 750 Hz
+    ret = psylab.signal.hl2spl(28, 750)
     assert ref == ret
 
+
+def test_spl2hl_array():
+    ref = np.array([55., 23.5, 17.5])
+    ret = psylab.signal.spl2hl(10, [125, 500, 1000])
+    np_testing.assert_allclose(ref, ret)
+
+def test_calibrate():
+    np.random.seed(0)
+    a = np.random.randn(1000, 2).astype(np.float32)
+    ret = psylab.signal.calibrate(a, [60, 70])
+    assert ret.dtype == np.float32
+    np_testing.assert_allclose(psylab.signal.sp2spl(np.sqrt(np.mean(ret.astype(float)**2, axis=0))), [60, 70], rtol=1e-5)
+    ret = psylab.signal.calibrate(a, 80, cal=100, out=a)
+    assert ret is a
+    np_testing.assert_allclose(np.sqrt(np.mean(a.astype(float)**2, axis=0)), [.1, .1], rtol=1e-5)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def test_mix_offsets():
+    a = np.ones(3)
+    b = np.ones(5)*4
+    c = np.ones(10)*-3
+    np_testing.assert_allclose(psylab.signal.mix(a,b), [5, 5, 5, 4, 4])
+    np_testing.assert_allclose(psylab.signal.mix(a,b,offsets=[1]), [4, 5, 5, 5, 4])
+    np_testing.assert_allclose(psylab.signal.mix(a,b,c,offsets=[0,5]),
+                               [-2, -2, -2, -3, -3, 1, 1, 1, 1, 1])
+
+
+def test_mix_as_channels():
+    a = np.ones(3)
+    b = np.ones((2,2))*2
+    ret = psylab.signal.mix(a,b,offsets=[0,2],as_channels=True)
+    ref = np.array([[1, 0, 0],
+                    [1, 0, 0],
+                    [1, 2, 2],
+                    [0, 2, 2]])
+    np_testing.assert_allclose(ret, ref)
+
+
+def test_mix_gains():
+    np.random.seed(0)
+    sigs = [np.random.randn(np.random.randint(100, 1000)) for i in range(120)]
+    offsets = np.random.randint(0, 5000, 120)
+    gains = np.random.uniform(-20, 0, 120)
+    ref = np.zeros(max(o + s.size for s,o in zip(sigs, offsets)))
+    for s,o,g in zip(sigs, offsets, gains):
+        ref[o:o+s.size] += s * 10**(g/20.)
+    ret = psylab.signal.mix(*sigs, offsets=offsets, gains=gains)
+    np_testing.assert_allclose(ret, ref)
+
+
+def test_mix_out():
+    a = np.ones((4,2), dtype=np.float32)
+    b = np.ones(2, dtype=np.float32)
+    ret = psylab.signal.mix(a,b,offsets=[0,3])
+    assert ret.dtype == np.float32
+    np_testing.assert_allclose(ret, [[1, 1], [1, 1], [1, 1], [2, 2], [1, 1]])
+    out = np.full((5,2), 9.)
+    ret = psylab.signal.mix(a,b,offsets=[0,3],out=out)
+    assert ret is out
+    np_testing.assert_allclose(out, [[1, 1], [1, 1], [1, 1], [2, 2], [1, 1]])
+
+
+def test_mix_snr():
+    np.random.seed(1)
+    target = np.random.randn(1000)
+    masker = np.random.randn(5000)
+    snrs = np.arange(-10, 11, 5)
+    ret = psylab.signal.mix_snr(target, masker, snrs, start=200)
+    assert ret.shape == (5, 1000)
+    for r,snr in zip(ret, snrs):
+        m = r - target
+        np_testing.assert_allclose(m / m[0] * masker[200], masker[200:1200])
+        np_testing.assert_allclose(20*np.log10(psylab.signal.rms(target) / psylab.signal.rms(m)), snr, atol=1e-10)
+
+
+def test_mix_snr_random():
+    np.random.seed(2)
+    target = np.random.randn(800, 2)
+    masker = np.random.randn(4000, 2)
+    snrs = np.array([-6, 0, 6, 12])
+    ret = psylab.signal.mix_snr(target, masker, snrs, fixed='masker', level=-20, start='random', seed=3)
+    assert ret.shape == (4, 800, 2)
+    starts = np.random.RandomState(3).randint(0, 3201, 4)
+    for r,snr,s in zip(ret, snrs, starts):
+        m = masker[s:s+800]
+        m = m * 10**(-20/20.) / np.sqrt(np.mean(m**2))
+        t = r - m
+        np_testing.assert_allclose(20*np.log10(np.sqrt(np.mean(t**2)) / np.sqrt(np.mean(m**2))), snr, atol=1e-10)
+        np_testing.assert_allclose(t / target, (t / target)[0, 0])
@@ -0,0 +1,62 @@
+import numpy as np
+import numpy.testing as npt
+import psylab
+from psylab.signal.peakpick import pick_peaks, peak_picker, expand_peaks, apply_peaks
+
+
+def _pick_peaks_ref(sig, n, window_size):
+    # Window by window, with a full sort
+    nframes = sig.shape[0] // window_size
+    ch = np.zeros((nframes, n), dtype=int)
+    rms = np.zeros((nframes, n))
+    for i in range(nframes):
+        frame = sig[i*window_size:(i+1)*window_size]
+        r = np.sqrt(np.mean(frame**2, axis=0))
+        ch[i] = np.sort(np.argsort(r)[-n:])
+        rms[i] = r[ch[i]]
+    return ch, rms
+
+
+def test_pick_peaks():
+    np.random.seed(0)
+    sig = np.random.randn(1003, 12)
+    ch_ref, rms_ref = _pick_peaks_ref(sig, 4, 50)
+    ch, rms = pick_peaks(sig, 4, 50, expand=False)
+    npt.assert_array_equal(ch, ch_ref)
+    npt.assert_allclose(rms, rms_ref)
+
+    ch, rms = pick_peaks(sig, 4, 50)
+    npt.assert_array_equal(ch, np.repeat(ch_ref, 50, axis=0))
+    npt.assert_allclose(rms, np.repeat(rms_ref, 50, axis=0))
+
+
+def test_expand_peaks():
+    np.random.seed(1)
+    sig = np.random.randn(1000, 8)
+    ch, rms = pick_peaks(sig, 3, 40, expand=False)
+    ch_all, rms_all = expand_peaks(ch, rms, 40)
+    ch_part, rms_part = expand_peaks(ch, rms, 40, 130, 420)
+    npt.assert_array_equal(ch_part, ch_all[130:420])
+    npt.assert_array_equal(rms_part, rms_all[130:420])
+
+
+def test_apply_peaks():
+    np.random.seed(2)
+    env = np.abs(np.random.randn(1010, 8))
+    carriers = np.random.randn(1010, 8)
+    ch, rms = pick_peaks(env, 3, 100, expand=False)
+    y = apply_peaks(carriers, ch, rms, 100)
+    ch_all, rms_all = expand_peaks(ch, rms, 100)
+    ref = np.zeros((1010, 3))
+    ref[:1000] = rms_all * np.take_along_axis(carriers[:1000], ch_all, axis=1)
+    npt.assert_allclose(y, ref)
+
+
+def test_peak_picker():
+    np.random.seed(3)
+    sig = np.random.randn(2000, 10)
+    ch_ref, rms_ref = pick_peaks(sig, 5, 64, expand=False)
+    p = peak_picker(5, 64)
+    out = [p.process(sig[i:i+37]) for i in range(0, 2000, 37)]
+    npt.assert_array_equal(np.concatenate([o[0] for o in out]), ch_ref)
+    npt.assert_allclose(np.concatenate([o[1] for o in out]), rms_ref)
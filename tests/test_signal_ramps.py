@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def _ramps_ref(data, fs, duration=10, shape='raisedcosine', set='onoff'):
+    # Builds the whole envelope
+    dur = int(np.round(np.float32(duration)*(np.float32(fs)/1000.)))
+    wspace = 2*dur
+    if shape == 'raisedcosine':
+        rf = np.power((((np.cos(np.pi+2*np.pi*np.arange(0,wspace-1)/(wspace-1)))*.5)+.5),2)
+    elif shape == 'hanning':
+        rf = np.hanning(wspace)
+    elif shape == 'hamming':
+        rf = np.hamming(wspace)
+    elif shape == 'linear':
+        r = np.linspace(0, 1, dur)
+        rf = np.concatenate((r, r[::-1]))
+    f_ramp = np.ones(data.shape[0])
+    if set in ['on', 'onoff']:
+        f_ramp[0:dur] = rf[0:dur]
+    if set in ['off', 'onoff']:
+        durp1 = dur-1
+        f_ramp[-(durp1):] = rf[-(durp1):]
+    return (data.T * f_ramp).T
+
+
+def test_ramps():
+    np.random.seed(0)
+    sig = np.random.randn(2000, 2)
+    for shape in ['raisedcosine', 'hanning', 'hamming', 'linear']:
+        for set in ['on', 'off', 'onoff']:
+            ref = _ramps_ref(sig, 44100, 10, shape, set)
+            ret = psylab.signal.ramps(sig, 44100, 10, shape, set)
+            np_testing.assert_allclose(ret, ref)
+    np_testing.assert_array_equal(sig, np.random.RandomState(0).randn(2000, 2))
+
+
+def test_ramps_inplace():
+    np.random.seed(1)
+    sig = np.random.randn(3, 2000).astype(np.float32)
+    ref = _ramps_ref(sig.T.astype(float), 44100, 5).T
+    ret = psylab.signal.ramps(sig, 44100, 5, axis=1, inplace=True)
+    assert ret is sig
+    assert ret.dtype == np.float32
+    np_testing.assert_allclose(ret, ref, rtol=1e-5)
+
+
+def test_ramps_short():
+    # The ramps overlap when the signal is shorter than both of them
+    sig = np.ones(300)
+    ret = psylab.signal.ramps(sig, 44100, 5, 'linear')
+    ref = np.ones(300)
+    ref[:220] = np.linspace(0, 1, 220)[:220]
+    ref[-219:] = np.linspace(1, 0, 220)[1:][-219:]
+    np_testing.assert_allclose(ret, ref)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import scipy.signal
+import psylab
+
+
+def test_resample_1():
+    x = np.random.randn(1000, 2)
+    for up, down in ((3, 2), (2, 3), (160, 147)):
+        ref = scipy.signal.resample_poly(x, up, down)
+        np_testing.assert_allclose(ref, psylab.signal.resample(x, up, down), atol=1e-12)
+
+
+def test_resampler():
+    x = np.random.randn(5000, 2)
+    for up, down in ((3, 2), (2, 3), (44, 37), (1, 4)):
+        ref = psylab.signal.resample(x, up, down)
+        r = psylab.signal.resampler(up, down)
+        ret = np.concatenate([r.process(x[i:i+333]) for i in range(0, x.shape[0], 333)] + [r.flush()])
+        np_testing.assert_allclose(ref, ret, atol=1e-12)
+
+
+def test_resample_2():
+    fs = 44100
+    x = np.sin(2 * np.pi * 1000 * np.arange(4410) / fs).astype(np.float32)
+    for quality in ('low', 'medium', 'high'):
+        y = psylab.signal.resample(x, 48000, fs, quality=quality)
+        assert y.dtype == np.float32
+        assert y.size == 4800
+        ref = np.sin(2 * np.pi * 1000 * np.arange(4800) / 48000.)
+        np_testing.assert_allclose(ref[500:-500], y[500:-500], atol=1e-3)
+        r = psylab.signal.resampler(160, 147, quality)
+        ret = np.concatenate([r.process(x[i:i+1000]) for i in range(0, x.size, 1000)] + [r.flush()])
+        assert ret.dtype == np.float32
+        np_testing.assert_allclose(y, ret, atol=1e-5)
+
+
+def test_interp_1():
+    x = np.random.randn(1000, 2)
+    y = psylab.signal.interp(x, 1500)
+    assert y.shape == (1500, 2)
+    np_testing.assert_allclose(psylab.signal.resample(x, 3, 2), y)
+    assert psylab.signal.interp(x[:, 0], 1234).shape == (1234,)
+    assert psylab.signal.interp(x[:, 0], 1234, 'linear').shape == (1234,)
+
+
+def test_interp_exact():
+    # The exact ratio is used, so a smooth signal is resampled without
+    # padding or truncation
+    t = np.arange(1000) / 1000.
+    x = np.sin(2 * np.pi * 5 * t)
+    for n in [1004, 1537, 999, 20011]:
+        y = psylab.signal.interp(x, n)
+        assert y.shape == (n,)
+        tt = np.arange(n) / float(n)
+        np_testing.assert_allclose(y[50:-50], np.sin(2 * np.pi * 5 * tt)[50:-50], atol=1e-3)
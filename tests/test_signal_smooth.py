@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def smooth_convolve(x, wsize, wtype):
+    s = np.r_[2*x[0]-x[wsize:1:-1], x, 2*x[-1]-x[-1:-wsize:-1]]
+    w = np.ones(wsize) if wtype == 'flat' else getattr(np, wtype)(wsize)
+    y = np.convolve(w/w.sum(), s, mode='same')
+    return y[wsize-1:-wsize+1]
+
+
+def test_smooth_1():
+    x = np.random.randn(2000, 2)
+    for wsize in (3, 10, 200):
+        for wtype in ('flat', 'hanning'):
+            ret = psylab.signal.smooth(x, wsize, wtype)
+            for i in range(2):
+                np_testing.assert_allclose(smooth_convolve(x[:, i], wsize, wtype), ret[:, i], atol=1e-10)
+            np_testing.assert_allclose(ret.T, psylab.signal.smooth(x.T, wsize, wtype, axis=1))
+
+
+def test_smoother():
+    x = np.random.randn(2000, 2)
+    for wsize in (3, 10, 200):
+        for wtype in ('flat', 'hanning'):
+            ref = psylab.signal.smooth(x, wsize, wtype)
+            s = psylab.signal.smoother(wsize, wtype)
+            ret = np.concatenate([s.process(x[i:i+64]) for i in range(0, x.shape[0], 64)] + [s.flush()])
+            np_testing.assert_allclose(ref, ret, atol=1e-10)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def lts_loop(sig, wsize, overlap=0):
+    pt = 0
+    n = 0
+    ltfft = np.zeros(wsize//2+1)
+    while pt + wsize < sig.size:
+        ltfft += np.abs(np.fft.rfft(sig[pt:pt+wsize] * np.hanning(wsize)))
+        pt += wsize - overlap
+        n += 1
+    ltfft += np.abs(np.fft.rfft(sig[pt:] * np.hanning(sig.size - pt), wsize))
+    return ltfft / (n+1)
+
+
+def test_lts_1():
+    x = np.random.randn(5000, 2)
+    for wsize, overlap in ((256, 0), (256, 128), (1024, 100), (8192, 0)):
+        ref = np.stack([lts_loop(x[:, i], wsize, overlap) for i in range(2)], axis=1)
+        np_testing.assert_allclose(ref, psylab.signal.lts(x, wsize, overlap, chunksize=3))
+        np_testing.assert_allclose(ref.T, psylab.signal.lts(x.T, wsize, overlap, axis=1))
+
+
+def test_magspec_1():
+    fs = 8000
+    x = psylab.signal.tone(1000, fs, 500)
+    f, y = psylab.signal.magspec(x, fs, 1024)
+    assert f.size == y.size == 513
+    assert np.argmax(y) == 128
+
+
+def test_lts_accumulator_1():
+    x = np.random.randn(5000, 2)
+    acc = psylab.signal.lts_accumulator(256, 64)
+    for i in range(0, x.shape[0], 300):
+        acc.process(x[i:i+300])
+    acc.flush()
+    np_testing.assert_allclose(psylab.signal.lts(x, 256, 64), acc.get_spectrum())
+
+    sigs = [np.random.randn(n) for n in (1000, 3000, 100, 2048)]
+    acc = psylab.signal.lts_accumulator(512)
+    parts = [psylab.signal.lts_accumulator(512) for i in range(2)]
+    for i, sig in enumerate(sigs):
+        acc.add(sig)
+        parts[i % 2].add(sig)
+    np_testing.assert_allclose(acc.get_spectrum(), parts[0].merge(parts[1]).get_spectrum())
+
+
+def test_ltass_1(tmpdir):
+    from scipy.io.wavfile import write as wavwrite
+    fs = 16000
+    acc = psylab.signal.lts_accumulator(1024)
+    for i in range(4):
+        sig = (np.random.randn(fs // (i + 1)) * 3000).astype(np.int16)
+        wavwrite(str(tmpdir.join("s{}.wav".format(i))), fs, sig)
+        acc.add(sig / 32768.)
+    ref = acc.get_spectrum()
+    np_testing.assert_allclose(ref, psylab.signal.ltass(str(tmpdir), 1024))
+    np_testing.assert_allclose(ref, psylab.signal.ltass(str(tmpdir), 1024, workers=2))
+
+
+def test_spectrogram_1():
+    fs = 8000
+    x = np.random.randn(fs * 2)
+    s = psylab.signal.spectrogram(x, fs, 256, 128, chunksize=10)
+    frames = np.array([x[i:i+256] * np.hanning(256) for i in range(0, x.size - 255, 128)])
+    ref = 20 * np.log10(np.abs(np.fft.rfft(frames, axis=1)))
+    data, extent = s.get_data()
+    np_testing.assert_allclose(ref, data, rtol=1e-4, atol=1e-3)
+    assert extent == (0, 124 * 128 / 8000.)
+
+    data, extent = s.get_data(0.5, 1.5, width=20)
+    assert data.shape[0] <= 21
+    assert extent[0] <= 0.5 and extent[1] >= 1.5
+    np_testing.assert_allclose(data.max(axis=0), ref[int(extent[0] * fs / 128):int(np.ceil(extent[1] * fs / 128))].max(axis=0), rtol=1e-4)
+
+    # The whole-signal spectrum includes the zero-padded last window, as lts
+    f, y = s.magspec()
+    np_testing.assert_allclose(20 * np.log10(psylab.signal.lts(x, 256, 128)), y, rtol=1e-4)
+    f, y = s.magspec(0, 1.)
+    np_testing.assert_allclose(20 * np.log10(np.abs(np.fft.rfft(frames[:63], axis=1)).mean(axis=0)), y, rtol=1e-4)
+
+
+def test_spectrogram_zoom():
+    # The cache is at a hop of nfft/2, and zooming in recomputes at a
+    # smaller hop, down to nfft - overlap
+    fs = 8000
+    x = np.random.randn(fs * 2)
+    s = psylab.signal.spectrogram(x, fs, 256, 240)
+    assert s.levels[0].shape[0] == (x.size - 256) // 128 + 1
+    data, extent = s.get_data(0.5, 0.6, width=50)
+    hop = int(np.ceil(.1 * fs / 50))
+    assert data.shape[0] >= 50
+    i0 = int(round(extent[0] * fs))
+    frames = np.array([x[i:i+256] * np.hanning(256) for i in range(i0, i0 + data.shape[0] * hop, hop)])
+    np_testing.assert_allclose(20 * np.log10(np.abs(np.fft.rfft(frames, axis=1))), data, rtol=1e-3, atol=1e-2)
+    data, extent = s.get_data(0.5, 0.51, width=1000)
+    assert data.shape[0] == int(np.ceil(.51 * fs / 16)) - int(.5 * fs / 16)
+
+
+def test_specplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as pp
+    fs = 8000
+    x = np.random.randn(fs)
+    psylab.signal.specplot(x, fs)
+    s = psylab.signal.specgram(x, fs, 256, 200)
+    psylab.signal.specplot(s, fs, 'r-', fighandle=2)
+    f, y = pp.figure(2).get_axes()[0].get_lines()[0].get_data()
+    np_testing.assert_allclose(y, s.magspec()[1])
+    pp.close('all')
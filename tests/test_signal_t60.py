@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+from scipy.stats import linregress
+import psylab
+from psylab.signal.t60 import cumr2
+
+
+def decays(fs, rts, dur=1.5):
+    rng = np.random.RandomState(0)
+    t = np.arange(int(fs * dur)) / float(fs)
+    return np.array([rng.randn(t.size) * 10**(-3 * t / rt) for rt in rts]).T
+
+
+def test_t60_1():
+    fs = 16000
+    irs = decays(fs, (0.3, 0.6))
+    for i in range(2):
+        y = np.flipud(np.cumsum(np.flipud(irs[:, i]**2)))
+        y = 10 * np.log10(y / np.max(y))
+        xtime = np.linspace(0, len(y) / (fs / 1000.), len(y))
+        begin = int(np.round(fs * .05))
+        r2 = cumr2(xtime[begin:], y[begin:])
+        stop = begin + 2 + np.nanargmax(r2[2:])
+        slope, intercept = linregress(xtime[begin:stop], y[begin:stop])[:2]
+        rt, iidc = psylab.signal.t60(irs[:, i], fs)
+        assert rt == np.round(np.abs(60. / slope) - intercept)
+        np_testing.assert_allclose(y, iidc)
+
+
+def test_t60_bands_1():
+    fs = 16000
+    rts = (0.3, 0.6, 1.2)
+    t20, t30, t60 = psylab.signal.t60_bands(decays(fs, rts), fs)
+    assert t20.shape == t30.shape == t60.shape == (3, 6)
+    np_testing.assert_allclose(t30[:, 3:], np.tile(np.array(rts)[:, np.newaxis] * 1000, (1, 3)), rtol=0.1)
+    ret = psylab.signal.t60_bands(decays(fs, rts)[:, 1], fs)
+    np_testing.assert_allclose(t30[1], ret[1])
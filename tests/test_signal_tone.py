@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def test_tone_1():
+    fs = 44100
+    ref = np.sin(2 * np.pi * 1000 * np.arange(1, 4411) / fs) * .5
+    ret = psylab.signal.tone(1000, fs, 100, amp=.5)
+    np_testing.assert_allclose(ref, ret, atol=1e-10)
+
+
+def test_tone_float32_out():
+    fs = 44100
+    ref = psylab.signal.tone(440, fs, 2000, amp=-6)
+    buf = np.empty(ref.size, dtype=np.float32)
+    ret = psylab.signal.tone(440, fs, 2000, amp=-6, out=buf)
+    assert ret is buf
+    np_testing.assert_allclose(ref, ret, atol=1e-6)
+
+
+def test_tone_batch_1():
+    fs = 44100
+    f = np.array((250., 500., 1000.))
+    amp = np.array((-6., .5, 1.))
+    ret = psylab.signal.tone_batch(f, fs, 100, amp=amp, phase=90)
+    assert ret.shape == (3, 4410)
+    for i in range(3):
+        ref = psylab.signal.tone(f[i], fs, 100, amp=amp[i], phase=90)
+        np_testing.assert_allclose(ref, ret[i], atol=1e-10)
+
+
+def test_tone_generator_1():
+    fs = 44100
+    ref = psylab.signal.tone(1000, fs, 1000, amp=-3)
+    g = psylab.signal.tone_generator(1000, fs, amp=-3)
+    ret = np.concatenate([g.get_block(n) for n in (100, 1000, 33, 42967)])
+    np_testing.assert_allclose(ref, ret, atol=1e-10)
+
+
+def test_tone_generator_out():
+    # Non-contiguous out arrays are written to
+    fs = 44100
+    ref = psylab.signal.tone(1000, fs, 10, amp=-3)
+    g = psylab.signal.tone_generator(1000, fs, amp=-3)
+    buf = np.zeros((ref.size, 2))
+    ret = g.get_block(ref.size, out=buf[:, 1])
+    np_testing.assert_allclose(buf[:, 1], ref, atol=1e-10)
+    assert ret.base is buf
+
+    g = psylab.signal.tone_generator([500, 1000], fs)
+    buf = np.zeros((ref.size, 2))
+    g.get_block(ref.size, out=buf.T)
+    np_testing.assert_allclose(buf[:, 1], psylab.signal.tone(1000, fs, 10), atol=1e-10)
+
+
+def test_tcomplex_1():
+    fs = 44100
+    f = np.array((200., 400., 600.))
+    ref = np.zeros(fs)
+    for fi in f:
+        ref += psylab.signal.tone(fi, fs, 1000, amp=.25, phase=30)
+    ret = psylab.signal.tcomplex(200, fs, 1000, ncomponents=3, amp=.25, phase=30)
+    np_testing.assert_allclose(ref, ret, atol=1e-9)
+
+
+def test_tcomplex_methods():
+    fs = 48000
+    ref = psylab.signal.tcomplex(100, fs, 500, ncomponents=40, phase='schroeder', method='sum')
+    ret = psylab.signal.tcomplex(100, fs, 500, ncomponents=40, phase='schroeder', method='fft')
+    np_testing.assert_allclose(ref, ret, atol=1e-9)
@@ -47,3 +47,51 @@ def test_sliding_window_2():
 
     np_testing.assert_allclose(ref.shape, ret.shape)
 
+
+
+def _windower_frames(sig, w, blocksizes):
+    frames = []
+    i = 0
+    for n in blocksizes:
+        frames.append(w.process(sig[i:i+n]).copy())
+        i += n
+    return np.concatenate(frames)
+
+
+def test_windower():
+    np.random.seed(0)
+    sig = np.random.randn(3000, 2)
+    blocksizes = np.random.randint(0, 300, 30)
+    sig = sig[:blocksizes.sum()]
+    for ws, ss in [(256, 256), (256, 64), (100, 130), (7, 1)]:
+        ref = psylab.signal.sliding_window(sig, (ws, 2), (ss, 2), flatten=False)[:, 0]
+        w = psylab.signal.windower(ws, ss)
+        ret = _windower_frames(sig, w, blocksizes)
+        np_testing.assert_array_equal(ret, ref)
+
+
+def test_windower_1d():
+    sig = np.arange(1000.)
+    w = psylab.signal.windower(50, 20, size=60)
+    ret = _windower_frames(sig, w, [1, 499, 3, 497])
+    ref = psylab.signal.sliding_window(sig, 50, 20)
+    np_testing.assert_array_equal(ret, ref)
+
+
+def test_windower_views():
+    w = psylab.signal.windower(64, 32)
+    frames = w.process(np.ones((200, 3), dtype=np.float32))
+    assert frames.shape == (5, 64, 3)
+    assert frames.dtype == np.float32
+    assert np.shares_memory(frames, w.buf)
+
+
+def test_windower_flush():
+    sig = np.arange(1, 101.)
+    w = psylab.signal.windower(32, 16)
+    frames = np.concatenate((w.process(sig), w.flush()))
+    assert frames.shape == (6, 32)
+    np_testing.assert_array_equal(frames[-1], np.concatenate((sig[80:], np.zeros(12))))
+    # Nothing is left after the last window
+    w.process(sig[:48])
+    assert w.flush().shape[0] == 0
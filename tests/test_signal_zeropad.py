@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import numpy as np
+import numpy.testing as np_testing
+import psylab
+
+
+def test_zeropad():
+    a,b = psylab.signal.zeropad(np.ones(3), np.ones((5,2)))
+    np_testing.assert_allclose(a, [1, 1, 1, 0, 0])
+    assert b.shape == (5,2)
+
+
+def test_zeropad_batch():
+    np.random.seed(0)
+    signals = [np.random.randn(np.random.randint(1, 100), 2) for i in range(20)]
+    y, lengths, mask = psylab.signal.zeropad_batch(signals)
+    maxlen = max(sig.shape[0] for sig in signals)
+    assert y.shape == (20, maxlen, 2)
+    for row, m, n, sig in zip(y, mask, lengths, signals):
+        assert n == sig.shape[0]
+        np_testing.assert_array_equal(row, psylab.signal.zeropad(sig, np.zeros(maxlen))[0])
+        np_testing.assert_array_equal(m, np.arange(maxlen) < n)
+
+
+def test_zeropad_batch_options():
+    signals = [np.ones(10), np.ones(3), np.ones(7)]
+    y, lengths, mask = psylab.signal.zeropad_batch(signals, length=5, dtype=np.float32)
+    assert y.dtype == np.float32
+    np_testing.assert_array_equal(lengths, [5, 3, 5])
+    np_testing.assert_array_equal(y, mask)
+
+    filename = os.path.join(tempfile.mkdtemp(), 'batch.npy')
+    y, lengths, mask = psylab.signal.zeropad_batch(signals, filename=filename)
+    assert isinstance(y, np.memmap)
+    del y
+    np_testing.assert_array_equal(np.load(filename), mask)